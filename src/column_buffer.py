@@ -0,0 +1,44 @@
+import numpy as np
+
+
+class ColumnBuffer:
+    """Growable structured-array buffer with amortised appends and zero-copy views of the filled rows.
+
+    Capacity doubles as rows are appended, but never past max_rows unless a single append needs more.
+    clear() keeps the allocation, so one buffer can be refilled batch after batch.
+    """
+
+    def __init__(self, dtype, capacity=1 << 16, max_rows=None):
+        self.dtype = np.dtype(dtype)
+        self.max_rows = max_rows
+        self.data = np.empty(capacity, dtype=self.dtype)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return self.size * self.dtype.itemsize
+
+    def append(self, records):
+        needed = self.size + len(records)
+        if needed > len(self.data):
+            self.grow(needed)
+        self.data[self.size:needed] = records
+        self.size = needed
+
+    def grow(self, needed):
+        capacity = 2 * len(self.data)
+        if self.max_rows is not None:
+            capacity = min(capacity, self.max_rows)
+        data = np.empty(max(capacity, needed), dtype=self.dtype)
+        data[:self.size] = self.data[:self.size]
+        self.data = data
+
+    def view(self):
+        """The filled rows; valid until the next append or clear."""
+        return self.data[:self.size]
+
+    def clear(self):
+        self.size = 0
@@ -0,0 +1,85 @@
+import json
+import os
+import struct
+import numpy as np
+import torch
+from ibex_reader import COLUMNS
+
+HEADER_FILE = "dataset.json"
+NPY_HEADER_SIZE = 128  # fixed so the header can be rewritten in place and torch.from_file can skip it
+
+
+def npy_header(dtype, rows):
+    header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (np.lib.format.dtype_to_descr(dtype), rows)
+    header = header.ljust(NPY_HEADER_SIZE - 11) + "\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+def is_columnar_dataset(path):
+    return os.path.isfile(os.path.join(path, HEADER_FILE))
+
+
+class ColumnarDatasetWriter:
+    """Writes one raw .npy file per column plus a JSON header into a dataset directory."""
+
+    def __init__(self, directory, dtypes=None):
+        self.directory = directory
+        dtypes = dtypes or {column: np.float64 for column in COLUMNS}
+        self.dtypes = {column: np.dtype(dtype) for column, dtype in dtypes.items()}
+        self.rows = 0
+        os.makedirs(directory, exist_ok=True)
+        self.files = {}
+        for column, dtype in self.dtypes.items():
+            column_file = open(os.path.join(directory, f"{column}.npy"), 'wb')
+            column_file.write(npy_header(dtype, 0))
+            self.files[column] = column_file
+
+    def append(self, data):
+        """Append rows given either as a structured array or as a 2D array in COLUMNS order."""
+        for column, column_file in self.files.items():
+            if data.dtype.names:
+                values = data[column]
+            else:
+                values = data[:, COLUMNS.index(column)]
+            np.ascontiguousarray(values, dtype=self.dtypes[column]).tofile(column_file)
+        self.rows += len(data)
+
+    def close(self):
+        for column, column_file in self.files.items():
+            column_file.seek(0)
+            column_file.write(npy_header(self.dtypes[column], self.rows))
+            column_file.close()
+        header = {
+            "format": "ibex-columnar",
+            "version": 1,
+            "rows": self.rows,
+            "header_size": NPY_HEADER_SIZE,
+            "columns": [{"name": column, "dtype": dtype.str, "file": f"{column}.npy"}
+                        for column, dtype in self.dtypes.items()],
+        }
+        with open(os.path.join(self.directory, HEADER_FILE), 'w') as file:
+            json.dump(header, file, indent=2)
+
+
+class ColumnarDataset:
+    """Read-only, memory-mapped access to a dataset written by ColumnarDatasetWriter."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, HEADER_FILE), 'r') as file:
+            self.header = json.load(file)
+        self.rows = self.header["rows"]
+        self.columns = {column["name"]: column for column in self.header["columns"]}
+
+    def column(self, name):
+        return np.load(os.path.join(self.directory, self.columns[name]["file"]), mmap_mode='r')
+
+    def torch_column(self, name):
+        dtype = np.dtype(self.columns[name]["dtype"])
+        skipped = self.header["header_size"] // dtype.itemsize
+        values = torch.from_file(os.path.join(self.directory, self.columns[name]["file"]), shared=False,
+                                 size=skipped + self.rows, dtype=torch.from_numpy(np.empty(0, dtype)).dtype)
+        return values[skipped:]
+
+    def __len__(self):
+        return self.rows
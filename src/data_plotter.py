@@ -3,6 +3,7 @@ import os
 import numpy as np
 from matplotlib import pyplot as plt
 import gc
+from good_times import load_good_times
 
 
 class PearsonsMatrixCreator:
@@ -42,7 +43,7 @@ class PearsonsMatrixCreator:
 
     def load_instruction_file(self, instruction_file):
         try:
-            return np.loadtxt(instruction_file, dtype='str')
+            return load_good_times(instruction_file)
         except FileNotFoundError as e:
             self.terminal.append(f"File not found: {e}")
 
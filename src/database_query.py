@@ -0,0 +1,53 @@
+import sqlite3
+import numpy as np
+from ibex_reader import IBEX_DTYPE, parse_hex
+
+
+class DatabaseQuery:
+    """Chunked read access to a sorted database, returning structured numpy arrays."""
+
+    def __init__(self, name, chunk_size=100000, table="data"):
+        self.conn = sqlite3.connect(name)
+        self.chunk_size = chunk_size
+        self.table = table
+
+    def met_window(self, start_time, end_time, columns=None):
+        return self.fetch_chunks("MET BETWEEN ? AND ? ORDER BY MET", (start_time, end_time), columns)
+
+    def channel(self, ch, columns=None):
+        return self.fetch_chunks("ch = ?", (self.code(ch),), columns)
+
+    def coincidence_type(self, ty, columns=None):
+        return self.fetch_chunks("ty = ?", (self.code(ty),), columns)
+
+    @staticmethod
+    def code(value):
+        # codes are stored decoded; accept the hex spelling used in the data files as well
+        return parse_hex(value) if isinstance(value, str) else int(value)
+
+    @staticmethod
+    def query_dtype(columns=None):
+        columns = list(columns) if columns else list(IBEX_DTYPE.names)
+        return np.dtype([(column, IBEX_DTYPE[column]) for column in columns])
+
+    def fetch_chunks(self, condition, parameters, columns=None):
+        dtype = self.query_dtype(columns)
+        columns = list(dtype.names)
+        column_list = ', '.join(f'"{column}"' for column in columns)
+        cursor = self.conn.execute(f'SELECT {column_list} FROM {self.table} WHERE {condition}', parameters)
+        while True:
+            rows = cursor.fetchmany(self.chunk_size)
+            if not rows:
+                break
+            yield np.array(rows, dtype=dtype)
+
+    @staticmethod
+    def collect(chunks, columns=None):
+        """Concatenate fetched chunks; a query without matches gives an empty array of the query's dtype."""
+        chunks = list(chunks)
+        if not chunks:
+            return np.empty(0, dtype=DatabaseQuery.query_dtype(columns))
+        return np.concatenate(chunks)
+
+    def close(self):
+        self.conn.close()
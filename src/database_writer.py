@@ -0,0 +1,134 @@
+import sqlite3
+import numpy as np
+from ibex_reader import check_whole_numbers
+
+COLUMN_TYPES = [
+    ("MET", "REAL"),
+    ("RA", "REAL"),
+    ("Decl", "REAL"),
+    ("ch", "INTEGER"),
+    ("ty", "INTEGER"),
+    ("count", "INTEGER"),
+    ("selnbits", "INTEGER"),
+    ("phase", "REAL"),
+    ("locXRE", "REAL"),
+    ("locYRE", "REAL"),
+    ("locZRE", "REAL"),
+]
+
+
+class DatabaseWriter:
+    """Bulk loader for the typed `data` table, committing once per batch of files.
+
+    Every written file is recorded in the processed_files ledger in the same transaction as its
+    rows, so an interrupted run can be resumed without duplicating data. Writers for several tables
+    of one database can share a connection; only the writer that opened it closes it.
+    """
+
+    def __init__(self, name, files_per_transaction=64, table="data", connection=None):
+        self.name = name
+        self.table = table
+        self.files_per_transaction = files_per_transaction
+        self.pending_files = 0
+        self.owns_connection = connection is None
+        self.conn = sqlite3.connect(name) if connection is None else connection
+        self.cursor = self.conn.cursor()
+        self.cursor.execute("PRAGMA journal_mode=WAL")
+        self.cursor.execute("PRAGMA synchronous=NORMAL")
+        self.cursor.execute("PRAGMA temp_store=MEMORY")
+        self.cursor.execute("PRAGMA cache_size=-262144")
+        self.create_table()
+        self.create_ledger()
+        column_list = ', '.join(f'"{column}"' for column, _ in COLUMN_TYPES)
+        placeholders = ', '.join('?' for _ in COLUMN_TYPES)
+        self.insert_query = f'INSERT INTO {self.table} ({column_list}, file_id) VALUES ({placeholders}, ?)'
+        self.ledger = self.load_ledger()
+        self.file_id_index_built = False
+
+    def create_table(self):
+        column_definitions = ', '.join(f'"{column}" {column_type}' for column, column_type in COLUMN_TYPES)
+        self.cursor.execute(f'CREATE TABLE IF NOT EXISTS {self.table} ({column_definitions}, file_id INTEGER)')
+        existing_columns = [row[1] for row in self.cursor.execute(f'PRAGMA table_info({self.table})')]
+        if "file_id" not in existing_columns:
+            self.cursor.execute(f'ALTER TABLE {self.table} ADD COLUMN file_id INTEGER')
+        self.conn.commit()
+
+    def create_ledger(self):
+        self.cursor.execute('CREATE TABLE IF NOT EXISTS processed_files ('
+                            'file_id INTEGER PRIMARY KEY, data_table TEXT NOT NULL, path TEXT NOT NULL, '
+                            'size INTEGER, mtime_ns INTEGER, rows INTEGER, UNIQUE (data_table, path))')
+        self.conn.commit()
+
+    def load_ledger(self):
+        query = 'SELECT path, file_id, size, mtime_ns FROM processed_files WHERE data_table = ?'
+        return {path: (file_id, size, mtime_ns) for path, file_id, size, mtime_ns in
+                self.cursor.execute(query, (self.table,))}
+
+    def is_processed(self, path, size, mtime_ns):
+        entry = self.ledger.get(path)
+        return entry is not None and entry[1] == size and entry[2] == mtime_ns
+
+    def rows(self, data, file_id=None):
+        columns = []
+        for column, column_type in COLUMN_TYPES:
+            values = data[column]
+            if column_type == "INTEGER":
+                values = values.astype(np.int64)
+            columns.append(values.tolist())
+        columns.append([file_id] * len(data))
+        return zip(*columns)
+
+    def register_file(self, path, size, mtime_ns, rows):
+        entry = self.ledger.get(path)
+        if entry is None:
+            self.cursor.execute('INSERT INTO processed_files (data_table, path, size, mtime_ns, rows) '
+                                'VALUES (?, ?, ?, ?, ?)', (self.table, path, size, mtime_ns, rows))
+            file_id = self.cursor.lastrowid
+        else:
+            file_id = entry[0]
+            # the file changed since it was loaded: drop its old rows before inserting the new ones
+            if not self.file_id_index_built:
+                self.cursor.execute(f'CREATE INDEX IF NOT EXISTS {self.table}_file_id_idx ON {self.table} (file_id)')
+                self.file_id_index_built = True
+            self.cursor.execute(f'DELETE FROM {self.table} WHERE file_id = ?', (file_id,))
+            self.cursor.execute('UPDATE processed_files SET size = ?, mtime_ns = ?, rows = ? WHERE file_id = ?',
+                                (size, mtime_ns, rows, file_id))
+        self.ledger[path] = (file_id, size, mtime_ns)
+        return file_id
+
+    def write(self, data, path=None, size=None, mtime_ns=None):
+        """Insert data and record path in the ledger, rejecting fractional integer values before either."""
+        for column, column_type in COLUMN_TYPES:
+            if column_type == "INTEGER":
+                try:
+                    check_whole_numbers(data[column], column)
+                except ValueError as e:
+                    raise ValueError(f"{path}: {e}" if path is not None else str(e)) from None
+        file_id = self.register_file(path, size, mtime_ns, len(data)) if path is not None else None
+        if len(data) > 0:
+            self.cursor.executemany(self.insert_query, self.rows(data, file_id))
+        self.pending_files += 1
+        if self.pending_files >= self.files_per_transaction:
+            self.commit()
+
+    def commit(self):
+        self.conn.commit()
+        self.pending_files = 0
+
+    def finish_load(self):
+        """Commit outstanding rows and switch back to a durable rollback journal."""
+        self.commit()
+        self.cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.cursor.execute("PRAGMA journal_mode=DELETE")
+        self.cursor.execute("PRAGMA synchronous=FULL")
+
+    def build_indexes(self):
+        self.cursor.execute(f'CREATE INDEX IF NOT EXISTS {self.table}_met_idx ON {self.table} (MET)')
+        self.cursor.execute(f'CREATE INDEX IF NOT EXISTS {self.table}_ch_ty_idx ON {self.table} (ch, ty)')
+        self.cursor.execute('ANALYZE')
+        self.conn.commit()
+
+    def close(self):
+        self.commit()
+        if self.owns_connection:
+            self.conn.close()
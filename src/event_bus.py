@@ -0,0 +1,87 @@
+import threading
+
+# worker signal name -> event channel
+WORKER_SIGNALS = {
+    "update_progress": "progress",
+    "update_second_progress": "second_progress",
+    "update_label": "label",
+    "update_second_label": "second_label",
+}
+
+
+class EventBus:
+    """Thread-safe collector of log lines and progress updates, delivered to a sink in coalesced batches.
+
+    Log lines keep their order; progress and label channels keep only their latest value. Every
+    interval_ms a background thread hands the pending batch to sink(lines, updates) in one call.
+    The bus has an append() method, so workers can use it wherever they expect a terminal.
+    """
+
+    def __init__(self, sink, interval_ms=100):
+        self.sink = sink
+        self.interval = interval_ms / 1000
+        self.lock = threading.Lock()
+        self.lines = []
+        self.updates = {}
+        self.stop_event = threading.Event()
+        self.flusher = None
+
+    def append(self, text):
+        with self.lock:
+            self.lines.append(str(text))
+
+    def update(self, channel, value):
+        with self.lock:
+            self.updates[channel] = value
+
+    def connect_worker(self, worker, connection_type=None):
+        """Route a worker's progress and label signals into the bus, called directly in the worker's thread."""
+        for signal_name, channel in WORKER_SIGNALS.items():
+            slot = (lambda value, channel=channel: self.update(channel, value))
+            if connection_type is None:
+                getattr(worker, signal_name).connect(slot)
+            else:
+                getattr(worker, signal_name).connect(slot, type=connection_type)
+
+    def flush(self):
+        with self.lock:
+            lines, self.lines = self.lines, []
+            updates, self.updates = self.updates, {}
+        if lines or updates:
+            self.sink(lines, updates)
+
+    def start(self):
+        if self.flusher is None:
+            self.stop_event.clear()
+            self.flusher = threading.Thread(target=self.run, name="event-bus", daemon=True)
+            self.flusher.start()
+        return self
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.flush()
+
+    def stop(self):
+        if self.flusher is not None:
+            self.stop_event.set()
+            self.flusher.join()
+            self.flusher = None
+        self.flush()
+
+
+class LoggerSink:
+    """Sink for runs without a GUI: log lines go to the logger, progress is logged whenever it changes."""
+
+    def __init__(self, logger):
+        self.logger = logger
+        self.label = ""
+        self.progress = None
+
+    def __call__(self, lines, updates):
+        for line in lines:
+            self.logger.info(line)
+        self.label = updates.get("label", self.label)
+        progress = updates.get("progress")
+        if progress is not None and progress != self.progress:
+            self.progress = progress
+            self.logger.info(f"[{progress:3d}%] {self.label}")
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import re
+
+QUATERNION_EXTENSIONS = [".attdba", ".attd2a"]
+CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "ibex_catalog")
+# bumped whenever the per-directory entry gains a field, so older caches are rescanned
+CACHE_VERSION = 2
+HALF_YEAR_DIR = re.compile(r'^\d{4}[AB]$')
+ORBIT_PATTERN = re.compile(r'(?<!\d)(\d{4}[ab]?)(?![\dAB])')
+
+
+def parse_orbit(relative_path):
+    for component in reversed(relative_path.split(os.sep)):
+        if HALF_YEAR_DIR.match(component):
+            continue
+        match = ORBIT_PATTERN.search(component)
+        if match:
+            return match.group(1)
+    return None
+
+
+class FileCatalog:
+    """Cached listing of an archive tree with file sizes, mtimes, quaternion types and orbits.
+
+    A rescan only re-lists directories whose mtime changed since the cache was written. Files rewritten
+    in place do not change their directory's mtime, so the cached sizes and mtimes can be stale: they
+    are fine for progress and throughput figures, but anything that detects changes or compares sizes
+    must os.stat() the file itself. Symlinked directories are skipped, as os.walk does not descend into them.
+    """
+
+    def __init__(self, root, cache_path=None):
+        self.root = os.path.abspath(root)
+        if cache_path is None:
+            digest = hashlib.sha1(self.root.encode("utf-8")).hexdigest()
+            cache_path = os.path.join(CACHE_DIRECTORY, f"{digest}.json")
+        self.cache_path = cache_path
+        self.directories = {}
+        self.rescanned_dirs = 0
+
+    def load_cache(self):
+        try:
+            with open(self.cache_path, 'r') as file:
+                cache = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        if cache.get("version") != CACHE_VERSION or cache.get("root") != self.root:
+            return {}
+        return cache["directories"]
+
+    def save_cache(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            temporary_path = f"{self.cache_path}.tmp"
+            with open(temporary_path, 'w') as file:
+                json.dump({"version": CACHE_VERSION, "root": self.root, "directories": self.directories}, file)
+            os.replace(temporary_path, self.cache_path)
+        except OSError:
+            pass
+
+    def scan(self):
+        cached_directories = self.load_cache()
+        self.directories = {}
+        self.rescanned_dirs = 0
+        stack = [""]
+        while stack:
+            relative_path = stack.pop()
+            try:
+                mtime_ns = os.stat(os.path.join(self.root, relative_path)).st_mtime_ns
+            except OSError:
+                continue
+            entry = cached_directories.get(relative_path)
+            if entry is None or entry["mtime_ns"] != mtime_ns:
+                entry = self.scan_directory(relative_path, mtime_ns)
+                self.rescanned_dirs += 1
+            self.directories[relative_path] = entry
+            stack.extend(os.path.join(relative_path, name) for name in reversed(entry["dirs"]))
+        self.save_cache()
+        return self
+
+    def scan_directory(self, relative_path, mtime_ns):
+        dirs = []
+        files = {}
+        try:
+            with os.scandir(os.path.join(self.root, relative_path)) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            dirs.append(entry.name)
+                        elif entry.is_dir():
+                            # symlinked directory: not descended into, so links cannot make the scan loop
+                            continue
+                        else:
+                            stat = entry.stat()
+                            files[entry.name] = [stat.st_size, stat.st_mtime_ns]
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return {
+            "mtime_ns": mtime_ns,
+            "dirs": dirs,
+            "files": files,
+            "quaternions": [ext for ext in QUATERNION_EXTENSIONS if any(name.endswith(ext) for name in files)],
+            "orbit": parse_orbit(relative_path),
+        }
+
+    def relative(self, path):
+        relative_path = os.path.relpath(os.path.abspath(path), self.root)
+        return "" if relative_path == "." else relative_path
+
+    def entry(self, path):
+        return self.directories.get(self.relative(path))
+
+    def walk(self, top=None):
+        """Yield (root, dirs, files) in the same top-down order as os.walk, without touching the disk."""
+        top_relative = self.relative(top) if top is not None else ""
+        if top_relative not in self.directories:
+            return
+        stack = [top_relative]
+        while stack:
+            relative_path = stack.pop()
+            entry = self.directories.get(relative_path)
+            if entry is None:
+                continue
+            yield os.path.join(self.root, relative_path) if relative_path else self.root, \
+                list(entry["dirs"]), list(entry["files"])
+            stack.extend(os.path.join(relative_path, name) for name in reversed(entry["dirs"]))
+
+    def subdirectories(self, path=None):
+        entry = self.entry(path if path is not None else self.root)
+        return list(entry["dirs"]) if entry else []
+
+    def count_dirs(self, top=None):
+        return sum(len(dirs) for _, dirs, _ in self.walk(top))
+
+    def has_quaternion(self, path, extension):
+        entry = self.entry(path)
+        return entry is not None and extension in entry["quaternions"]
+
+    def orbit(self, path):
+        entry = self.entry(path)
+        return entry["orbit"] if entry else None
+
+    def file_size(self, path):
+        entry = self.entry(os.path.dirname(path))
+        return entry["files"][os.path.basename(path)][0]
@@ -0,0 +1,136 @@
+import os
+from PyQt5.QtCore import QAbstractItemModel, QModelIndex, Qt
+from PyQt5.QtGui import QIcon
+
+
+class FileTreeNode:
+    __slots__ = ("name", "path", "is_dir", "parent", "row", "children", "pending", "listed")
+
+    def __init__(self, name, path, is_dir, parent, row):
+        self.name = name
+        self.path = path
+        self.is_dir = is_dir
+        self.parent = parent
+        self.row = row
+        self.children = []
+        self.pending = []
+        self.listed = False
+
+
+class LazyFileTreeModel(QAbstractItemModel):
+    """Tree model over os.scandir that lists a directory only when its node is expanded."""
+
+    fetch_batch_size = 1000
+
+    def __init__(self, path, config_file=None, parent=None):
+        super().__init__(parent)
+        if config_file:
+            self.res_path_base = config_file['ImageIcons']['res_path_base']
+            self.extension_mapping = config_file['ImageIcons']['extension_mapping']
+        else:
+            self.res_path_base = ""
+            self.extension_mapping = {}
+        self.icon_cache = {}
+        self.fetching = False
+        self.invisible_root = FileTreeNode("", None, True, None, 0)
+        self.invisible_root.children = [FileTreeNode(path, path, True, self.invisible_root, 0)]
+        self.invisible_root.listed = True
+
+    def node(self, index):
+        return index.internalPointer() if index.isValid() else self.invisible_root
+
+    def index(self, row, column, parent=QModelIndex()):
+        node = self.node(parent)
+        if column != 0 or not 0 <= row < len(node.children):
+            return QModelIndex()
+        return self.createIndex(row, column, node.children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parent_node = index.internalPointer().parent
+        if parent_node is None or parent_node is self.invisible_root:
+            return QModelIndex()
+        return self.createIndex(parent_node.row, 0, parent_node)
+
+    def rowCount(self, parent=QModelIndex()):
+        return len(self.node(parent).children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        node = self.node(parent)
+        if not node.listed or node.pending:
+            return node.is_dir
+        return bool(node.children)
+
+    def canFetchMore(self, parent):
+        node = self.node(parent)
+        return not self.fetching and node.is_dir and (not node.listed or bool(node.pending))
+
+    def fetchMore(self, parent):
+        node = self.node(parent)
+        if not node.listed:
+            node.pending = self.list_directory(node.path)
+            node.listed = True
+        batch = node.pending[:self.fetch_batch_size]
+        node.pending = node.pending[self.fetch_batch_size:]
+        if not batch:
+            return
+        first_row = len(node.children)
+        # views may ask for more rows from inside the insertion signals; finish this batch first
+        self.fetching = True
+        self.beginInsertRows(parent, first_row, first_row + len(batch) - 1)
+        for row, (name, is_dir) in enumerate(batch, start=first_row):
+            node.children.append(FileTreeNode(name, os.path.join(node.path, name), is_dir, node, row))
+        self.endInsertRows()
+        self.fetching = False
+
+    @staticmethod
+    def list_directory(path):
+        entries = []
+        try:
+            with os.scandir(path) as directory:
+                for entry in directory:
+                    try:
+                        entries.append((entry.name, entry.is_dir()))
+                    except OSError:
+                        entries.append((entry.name, False))
+        except OSError:
+            return []
+        return sorted(entries)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.DisplayRole:
+            return node.name
+        if role == Qt.DecorationRole:
+            return self.icon_for(node)
+        if role == Qt.ToolTipRole:
+            return node.path
+        return None
+
+    def file_path(self, index):
+        return self.node(index).path
+
+    def icon_for(self, node):
+        if node.is_dir:
+            key = None
+        else:
+            key = os.path.splitext(node.name)[1].lower()
+        if key not in self.icon_cache:
+            self.icon_cache[key] = self.create_icon(key)
+        return self.icon_cache[key]
+
+    def create_icon(self, extension):
+        if extension is None:
+            return QIcon('res/folder.png')
+        if extension in self.extension_mapping:
+            return QIcon(os.path.join(self.res_path_base, self.extension_mapping[extension]))
+        elif extension == "":
+            return QIcon(os.path.join(self.res_path_base, "FILE.png"))
+        else:
+            return QIcon(os.path.join(self.res_path_base, "unknownfile.png"))
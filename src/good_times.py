@@ -0,0 +1,85 @@
+import hashlib
+import os
+import numpy as np
+
+CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "ibex_good_times")
+MAX_CHANNELS = 8
+
+# Hi files list 6 channel flags followed by a 2/4 selection column, Lo files list 8 flags;
+# missing flags are stored as 0 and a missing selection column as -1
+GOOD_TIMES_DTYPE = np.dtype([
+    ("orbit", "U8"),
+    ("start_time", "f8"),
+    ("end_time", "f8"),
+    ("phase_start", "i2"),
+    ("phase_end", "i2"),
+    ("dataset", "U2"),
+    ("channels", "u1", (MAX_CHANNELS,)),
+    ("selection", "i2"),
+])
+
+memory_cache = {}
+
+
+def parse_good_times(instruction_file):
+    """Parse a HiCullGoodTimes/LoGoodTimes text file (any line endings, '#' comments) into GOOD_TIMES_DTYPE."""
+    with open(instruction_file, 'r') as file:
+        rows = [line.split('#', 1)[0].split() for line in file.read().splitlines()]
+    rows = [row for row in rows if row]
+    good_times = np.zeros(len(rows), dtype=GOOD_TIMES_DTYPE)
+    good_times["selection"] = -1
+    for i, row in enumerate(rows):
+        flags = row[6:]
+        if row[5] == "Hi" and len(flags) > 6:
+            good_times["selection"][i] = int(flags[6])
+            flags = flags[:6]
+        good_times["channels"][i, :len(flags)] = [int(flag) for flag in flags[:MAX_CHANNELS]]
+    for column, field in enumerate(["orbit", "start_time", "end_time", "phase_start", "phase_end", "dataset"]):
+        good_times[field] = [row[column] for row in rows]
+    return good_times
+
+
+def sidecar_path(instruction_file):
+    digest = hashlib.sha1(os.path.abspath(instruction_file).encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIRECTORY, f"{digest}.npz")
+
+
+def load_sidecar(instruction_file, source):
+    try:
+        with np.load(sidecar_path(instruction_file)) as sidecar:
+            if sidecar["source"].tolist() == list(source):
+                return sidecar["good_times"]
+    except (OSError, KeyError, ValueError):
+        pass
+    return None
+
+
+def save_sidecar(instruction_file, source, good_times):
+    path = sidecar_path(instruction_file)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = f"{path}.tmp.npz"
+        np.savez(temporary_path, good_times=good_times, source=np.array(source, dtype=np.int64))
+        os.replace(temporary_path, path)
+    except OSError:
+        pass
+
+
+def load_good_times(instruction_file):
+    """Typed good-times table, cached in memory and in a binary sidecar keyed by the file's mtime and size.
+
+    Raises FileNotFoundError like open() when the instruction file does not exist.
+    """
+    stat = os.stat(instruction_file)
+    source = (stat.st_mtime_ns, stat.st_size)
+    key = os.path.abspath(instruction_file)
+    cached = memory_cache.get(key)
+    if cached is not None and cached[0] == source:
+        return cached[1]
+    good_times = load_sidecar(instruction_file, source)
+    if good_times is None:
+        good_times = parse_good_times(instruction_file)
+        save_sidecar(instruction_file, source, good_times)
+    good_times.flags.writeable = False
+    memory_cache[key] = (source, good_times)
+    return good_times
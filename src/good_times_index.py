@@ -0,0 +1,69 @@
+import numpy as np
+
+
+class GoodTimesIndex:
+    """Interval index over a GOOD_TIMES_DTYPE table, keyed by orbit."""
+
+    def __init__(self, filters):
+        self.filters = filters
+        self.entries_by_orbit = {}
+        self.intervals_by_orbit = {}
+        for row_num, orbit in enumerate(filters["orbit"]):
+            self.entries_by_orbit.setdefault(str(orbit), []).append(row_num)
+        self.key_lengths = sorted({len(orbit) for orbit in self.entries_by_orbit})
+
+        start_values = filters["start_time"]
+        end_values = filters["end_time"]
+        for orbit, rows in self.entries_by_orbit.items():
+            self.intervals_by_orbit[orbit] = self.merge_intervals(start_values[rows], end_values[rows])
+
+    @staticmethod
+    def merge_intervals(start_values, end_values):
+        if len(start_values) == 0:
+            return np.empty(0), np.empty(0)
+        order = np.argsort(start_values, kind="stable")
+        start_values = start_values[order]
+        end_values = np.maximum.accumulate(end_values[order])
+        # a new interval begins wherever the start lies past every end seen so far
+        new_interval = np.ones(len(start_values), dtype=bool)
+        new_interval[1:] = start_values[1:] > end_values[:-1]
+        first_rows = np.flatnonzero(new_interval)
+        last_rows = np.append(first_rows[1:] - 1, len(start_values) - 1)
+        return start_values[first_rows], end_values[last_rows]
+
+    def orbits_in_path(self, filepath):
+        # equivalent to checking `orbit in filepath` for every table row, but only
+        # looks up the substrings of the path instead of scanning the whole table
+        orbits = []
+        for length in self.key_lengths:
+            for i in range(len(filepath) - length + 1):
+                key = filepath[i:i + length]
+                if key in self.entries_by_orbit and key not in orbits:
+                    orbits.append(key)
+        return orbits
+
+    def entries_for_path(self, filepath):
+        rows = []
+        for orbit in self.orbits_in_path(filepath):
+            rows.extend(self.entries_by_orbit[orbit])
+        rows.sort()
+        return self.filters[rows]
+
+    def intervals_for_path(self, filepath):
+        orbits = self.orbits_in_path(filepath)
+        if len(orbits) == 1:
+            return self.intervals_by_orbit[orbits[0]]
+        start_values = np.concatenate([np.empty(0)] + [self.intervals_by_orbit[orbit][0] for orbit in orbits])
+        end_values = np.concatenate([np.empty(0)] + [self.intervals_by_orbit[orbit][1] for orbit in orbits])
+        return self.merge_intervals(start_values, end_values)
+
+    def mask_for_path(self, filepath, met_values):
+        """Boolean row mask of the MET values lying inside any good interval of the file's orbit."""
+        start_values, end_values = self.intervals_for_path(filepath)
+        mask = np.zeros(len(met_values), dtype=bool)
+        if len(start_values) == 0:
+            return mask
+        positions = np.searchsorted(start_values, met_values, side="right") - 1
+        after_start = positions >= 0
+        mask[after_start] = met_values[after_start] <= end_values[positions[after_start]]
+        return mask
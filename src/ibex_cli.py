@@ -0,0 +1,203 @@
+"""Headless entry point for sorting and tensor creation.
+
+Run from the src directory, for example:
+
+    python -m ibex_cli sort /data/ibex --instruction ../dataset_manuals/HiCullGoodTimes.txt \
+        --quaternion .attdba --qualh Q-ABC Q-AB --file-types hide --channels all --database hi.db
+    python -m ibex_cli sort /data/ibex --instruction ../dataset_manuals/HiCullGoodTimes.txt \
+        --file-types hide --selection qabc=Q-ABC --selection qab=Q-AB --selection none=None --database hi.db
+    python -m ibex_cli tensors /data/ibex --instruction LoGoodTimes.txt --file-type lode \
+        --timespan "By channels" --prefix lode_hex_channel
+    python -m ibex_cli pearson hi_tensors lo_tensors --chunk-size 1000000 --output pearson.csv
+
+Progress and log lines go to stderr; Qt is never imported.
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+
+os.environ.setdefault("IBEX_HEADLESS", "1")
+
+import sorting_algorithm  # noqa: E402
+import tensor_creator  # noqa: E402
+import tensor_analyzer  # noqa: E402
+from event_bus import EventBus, LoggerSink  # noqa: E402
+
+INSTRUCTIONS = ["HiCullGoodTimes.txt", "LoGoodTimes.txt"]
+QUATERNIONS = [".attdba", ".attd2a"]
+TIMESPANS = ["By channels", "Every half year", "Every year", "All at once"]
+HEX_OPTIONS = ["Translate to int", "Replace with '0'"]
+OUTPUT_FORMATS = ["PyTorch tensors (.pt)", "Memory-mapped columns"]
+SELECTION_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def non_negative_int(value):
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or more, got {number}")
+    return number
+
+
+def channel_options(channels):
+    if any(channel.lower() == "all" for channel in channels):
+        return ["All"]
+    return [f"Channel {int(channel)}" for channel in channels]
+
+
+def selection_spec(spec):
+    """(name, qualh) of a --selection NAME=QUALH[,QUALH...] option; NAME must be usable in the table data_NAME."""
+    name, separator, qualh = spec.partition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError(f"{spec!r} is not of the form NAME=QUALH[,QUALH...]")
+    if not name:
+        raise argparse.ArgumentTypeError(f"{spec!r} has an empty selection name")
+    if not SELECTION_NAME.match(name):
+        raise argparse.ArgumentTypeError(f"selection name {name!r} must be a SQL identifier "
+                                         f"(letters, digits and underscores, not starting with a digit)")
+    qualh = [value for value in qualh.split(",") if value]
+    if not qualh:
+        raise argparse.ArgumentTypeError(f"{spec!r} lists no QUALH values")
+    return name, qualh
+
+
+def selection_profiles(args):
+    """--selection options as selection profiles, sharing the run's channels and particle events."""
+    return [(name, qualh, channel_options(args.channels), args.particle_events)
+            for name, qualh in args.selection or []]
+
+
+def event_bus():
+    logger = logging.getLogger("ibex")
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+    return EventBus(LoggerSink(logger), interval_ms=200).start()
+
+
+def run_sort(args, terminal):
+    sorter = sorting_algorithm.SortingAlgorithm(terminal, os.path.abspath(args.archive))
+    terminal.connect_worker(sorter)
+    # same order of setters as MainWindow.start_sorting_data_with_options
+    sorter.set_instruction_file(args.instruction)
+    sorter.set_quaternion_file_type(args.quaternion)
+    sorter.set_event_type(args.event)
+    sorter.set_qualh(args.qualh, args.instruction)
+    sorter.set_filenames_for_sorting(args.file_types)
+    sorter.set_channels(channel_options(args.channels))
+    sorter.set_particle_events(args.particle_events)
+    sorter.set_selection_profiles(selection_profiles(args))
+    sorter.set_workers(args.workers)
+    sorter.set_build_indexes(args.build_indexes)
+    sorter.set_profile_path(args.profile)
+    sorter.set_database_connection(args.database)
+    if sorter.database_writer is None:
+        return 1
+    sorter.first_stage_processing()
+    terminal.append("Sorting completed. Saving results...")
+    sorter.save_loading_log()
+    if args.paths_file:
+        sorter.save_correct_paths_to_file(args.paths_file)
+    sorter.close_connection()
+    return 0
+
+
+def run_tensors(args, terminal):
+    creator = tensor_creator.TensorCreator(terminal, os.path.abspath(args.archive))
+    terminal.connect_worker(creator)
+    # same order of setters as MainWindow.create_tensors_with_options
+    creator.set_instruction(args.instruction)
+    creator.set_quaternion_file(args.quaternion)
+    creator.set_filetype(args.file_type)
+    creator.set_timespan_attribute(args.timespan)
+    creator.set_hex(args.hex)
+    creator.set_channel_division(args.divide_by_channels)
+    creator.set_output_format(args.output_format)
+    creator.set_file_prefix(args.prefix)
+    creator.set_profile_path(args.profile)
+    creator.set_workers(args.workers)
+    creator.create_data_tensor()
+    terminal.append("Tensor creation completed.")
+    return 0
+
+
+def run_pearson(args, terminal):
+    analyzer = tensor_analyzer.PearsonsMatrixCreator(terminal, args.hi_directory, args.lo_directory,
+                                                     args.hi_prefix, args.lo_prefix,
+                                                     args.hi_instruction, args.lo_instruction)
+    analyzer.set_chunk_size(args.chunk_size)
+    analyzer.calculate_pearsons_for_all_channels()
+    analyzer.save_matrix_to_file(args.output)
+    terminal.append(f"Pearson matrix saved to {args.output}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m ibex_cli", description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sort_parser = subparsers.add_parser("sort", help="filter the archive into an SQLite database")
+    sort_parser.add_argument("archive", help="root directory of the IBEX archive")
+    sort_parser.add_argument("--instruction", required=True,
+                             help="path to HiCullGoodTimes.txt or LoGoodTimes.txt")
+    sort_parser.add_argument("--quaternion", choices=QUATERNIONS, default=QUATERNIONS[0])
+    sort_parser.add_argument("--event", choices=["Direct events", "Histogram events"], default="Direct events")
+    sort_parser.add_argument("--qualh", nargs="+", default=[],
+                             help="Q-ABC, Q-AB, Q-BC, Q-AC, None for Hi; TOF0-TOF3 for Lo")
+    sort_parser.add_argument("--file-types", nargs="+", required=True, choices=["hide", "lode", "hihb", "lohb"])
+    sort_parser.add_argument("--channels", nargs="+", default=["all"], help="channel numbers or 'all'")
+    sort_parser.add_argument("--particle-events", nargs="+", default=["All"],
+                             help="'All' for Hi; Hydrogen and/or Oxygen for Lo")
+    sort_parser.add_argument("--selection", action="append", type=selection_spec, metavar="NAME=QUALH[,QUALH...]",
+                             help="named selection written to table data_NAME; repeat to sort several "
+                                  "selections in one pass instead of --qualh")
+    sort_parser.add_argument("--workers", type=int, default=1)
+    sort_parser.add_argument("--build-indexes", action="store_true")
+    sort_parser.add_argument("--database", required=True, help="output .db file")
+    sort_parser.add_argument("--paths-file", help="text file listing the directories that were sorted")
+    sort_parser.add_argument("--profile", help="write per-stage timings to this .json or .csv file")
+    sort_parser.set_defaults(run=run_sort)
+
+    tensor_parser = subparsers.add_parser("tensors", help="build tensors from the archive")
+    tensor_parser.add_argument("archive", help="root directory of the IBEX archive")
+    tensor_parser.add_argument("--instruction", choices=INSTRUCTIONS, required=True)
+    tensor_parser.add_argument("--quaternion", choices=QUATERNIONS, default=QUATERNIONS[0])
+    tensor_parser.add_argument("--file-type", required=True, choices=["hide", "lode", "hihb", "lohb"])
+    tensor_parser.add_argument("--timespan", choices=TIMESPANS, default=TIMESPANS[0])
+    tensor_parser.add_argument("--hex", choices=HEX_OPTIONS, default=HEX_OPTIONS[0])
+    tensor_parser.add_argument("--divide-by-channels", choices=["On", "Off"], default="On")
+    tensor_parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default=OUTPUT_FORMATS[0])
+    tensor_parser.add_argument("--prefix", required=True, help="prefix of the saved tensor files")
+    tensor_parser.add_argument("--workers", type=int, default=1,
+                               help="worker processes for half-year and year builds")
+    tensor_parser.add_argument("--profile", help="write per-stage timings to this .json or .csv file")
+    tensor_parser.set_defaults(run=run_tensors)
+
+    pearson_parser = subparsers.add_parser("pearson", help="correlate good-time counts of the channel tensors")
+    pearson_parser.add_argument("hi_directory", help="directory of the Hi channel tensors")
+    pearson_parser.add_argument("lo_directory", help="directory of the Lo channel tensors")
+    pearson_parser.add_argument("--hi-prefix", default="hide_hex_channel_")
+    pearson_parser.add_argument("--lo-prefix", default="lode_hex_channel_")
+    pearson_parser.add_argument("--hi-instruction", default="../dataset_manuals/HiCullGoodTimes.txt")
+    pearson_parser.add_argument("--lo-instruction", default="../dataset_manuals/LoGoodTimes.txt")
+    pearson_parser.add_argument("--chunk-size", type=non_negative_int, default=0,
+                                help="rows per streamed chunk; 0 loads each channel whole")
+    pearson_parser.add_argument("--output", required=True, help="CSV file for the matrix")
+    pearson_parser.set_defaults(run=run_pearson)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    terminal = event_bus()
+    try:
+        return args.run(args, terminal)
+    finally:
+        terminal.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
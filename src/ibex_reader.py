@@ -0,0 +1,125 @@
+import time
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["MET", "RA", "Decl", "ch", "ty", "count", "selnbits", "phase", "locXRE", "locYRE", "locZRE"]
+HEX_COLUMNS = ["ch", "ty", "selnbits"]
+
+IBEX_DTYPE = np.dtype([
+    ("MET", "f8"),
+    ("RA", "f8"),
+    ("Decl", "f8"),
+    ("ch", "u1"),
+    ("ty", "u1"),
+    ("count", "f8"),
+    ("selnbits", "u4"),
+    ("phase", "f8"),
+    ("locXRE", "f8"),
+    ("locYRE", "f8"),
+    ("locZRE", "f8"),
+])
+
+# layout of created tensors and columnar datasets: MET keeps float64 precision, selnbits is dropped and
+# count is uint32; counts are range-checked when records are compacted and summed as int64
+TENSOR_DTYPE = np.dtype([
+    ("MET", "f8"),
+    ("RA", "f4"),
+    ("Decl", "f4"),
+    ("ch", "u1"),
+    ("ty", "u1"),
+    ("count", "u4"),
+    ("phase", "f4"),
+    ("locXRE", "f4"),
+    ("locYRE", "f4"),
+    ("locZRE", "f4"),
+])
+
+HEX_WIDTH = {"ch": 2, "ty": 2, "selnbits": 8}
+
+
+def hex_digit_table():
+    table = np.full(256, -1, dtype=np.int16)
+    for digit, character in enumerate("0123456789abcdef"):
+        table[ord(character)] = digit
+        table[ord(character.upper())] = digit
+    table[0] = 0  # NUL padding of strings shorter than the fixed width
+    return table
+
+
+HEX_DIGITS = hex_digit_table()
+
+
+def parse_hex(value):
+    return int(value, 16)
+
+
+def decode_hex(values, width=2, dtype=np.uint8):
+    """Decode hex strings of up to `width` digits through a byte view and a digit lookup table.
+
+    Raises ValueError naming the first value that is longer than `width` or holds a non-hex digit.
+    """
+    # size the byte strings to the longest value first: casting straight to S{width} would truncate
+    raw = np.asarray(values, dtype="S")
+    if raw.dtype.itemsize > width:
+        overlong = np.char.str_len(raw) > width
+        if overlong.any():
+            bad = raw[overlong][0].decode("ascii", "replace")
+            raise ValueError(f"invalid hex value: {bad!r} (more than {width} digits)")
+    raw = np.ascontiguousarray(raw, dtype=f"S{width}")
+    characters = raw.view(np.uint8).reshape(len(raw), width)
+    digits = HEX_DIGITS[characters]
+    if (digits < 0).any():
+        bad = raw[(digits < 0).any(axis=1)][0].decode("ascii", "replace")
+        raise ValueError(f"invalid hex value: {bad!r}")
+    decoded = np.zeros(len(raw), dtype=np.uint32)
+    for position in range(width):
+        # shorter strings are right-padded with NUL, which must not shift the value
+        present = characters[:, position] != 0
+        decoded = np.where(present, (decoded << 4) | digits[:, position].astype(np.uint32), decoded)
+    return decoded.astype(dtype)
+
+
+def check_whole_numbers(values, column):
+    """Raise ValueError naming the first value of a float column that an integer cast would truncate."""
+    values = np.asarray(values)
+    if values.dtype.kind != 'f':
+        return
+    fractional = values != np.trunc(values)
+    if fractional.any():
+        raise ValueError(f"{column} {values[fractional][0].item()!r} is not a whole number")
+
+
+def read_ibex_file(filepath, timings=None):
+    """Parse an 11-column hide/lode/hihb/lohb text file into a structured IBEX_DTYPE array.
+
+    When a timings dict is given, the seconds spent in the "parse" and "hex decode" steps are added to it.
+    """
+    start = time.perf_counter()
+    hex_seconds = 0.0
+    try:
+        frame = pd.read_csv(filepath, sep=r"\s+", header=None, names=COLUMNS, comment="#",
+                            dtype={column: str if column in HEX_COLUMNS else IBEX_DTYPE[column] for column in COLUMNS})
+    except pd.errors.EmptyDataError:
+        records = np.empty(0, dtype=IBEX_DTYPE)
+    else:
+        records = np.empty(len(frame), dtype=IBEX_DTYPE)
+        for column in COLUMNS:
+            if column in HEX_COLUMNS:
+                decode_start = time.perf_counter()
+                records[column] = decode_hex(frame[column].to_numpy(), HEX_WIDTH[column], IBEX_DTYPE[column])
+                hex_seconds += time.perf_counter() - decode_start
+            else:
+                records[column] = frame[column].to_numpy()
+
+    if timings is not None:
+        timings["parse"] = timings.get("parse", 0.0) + time.perf_counter() - start - hex_seconds
+        timings["hex decode"] = timings.get("hex decode", 0.0) + hex_seconds
+    return records
+
+
+def code_lookup_table(codes):
+    """256-entry boolean table marking the given two-character hex codes."""
+    table = np.zeros(256, dtype=bool)
+    for code in codes:
+        table[parse_hex(code)] = True
+    return table
@@ -0,0 +1,84 @@
+import numpy as np
+import torch
+
+
+class IntervalAggregator:
+    """Per-interval sums, means and event counts of a value column over inclusive MET intervals.
+
+    The rows are sorted by MET once and the values turned into a prefix sum, so each interval
+    costs two binary searches instead of a mask over the whole column.
+    """
+
+    def __init__(self, met_values, values):
+        met_values = self.as_numpy(met_values).astype(np.float64, copy=False)
+        values = self.as_numpy(values)
+        if len(met_values) > 1 and not (met_values[1:] >= met_values[:-1]).all():
+            order = np.argsort(met_values, kind='stable')
+            met_values = met_values[order]
+            values = values[order]
+        self.met_values = met_values
+        accumulator = np.float64 if values.dtype.kind == 'f' else np.int64
+        self.prefix_sum = np.zeros(len(values) + 1, dtype=accumulator)
+        np.cumsum(values, dtype=accumulator, out=self.prefix_sum[1:])
+
+    @staticmethod
+    def as_numpy(values):
+        if isinstance(values, torch.Tensor):
+            return values.numpy()
+        return np.asarray(values)
+
+    def bounds(self, start_times, end_times):
+        first = np.searchsorted(self.met_values, np.asarray(start_times, dtype=np.float64), side='left')
+        last = np.searchsorted(self.met_values, np.asarray(end_times, dtype=np.float64), side='right')
+        return first, np.maximum(last, first)
+
+    def sums(self, start_times, end_times):
+        first, last = self.bounds(start_times, end_times)
+        return self.prefix_sum[last] - self.prefix_sum[first]
+
+    def event_counts(self, start_times, end_times):
+        first, last = self.bounds(start_times, end_times)
+        return last - first
+
+    def means(self, start_times, end_times):
+        first, last = self.bounds(start_times, end_times)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (self.prefix_sum[last] - self.prefix_sum[first]) / (last - first)
+
+
+class StreamingIntervalAggregator:
+    """Accumulates per-interval sums and event counts chunk by chunk, so only one chunk is in memory.
+
+    Chunks may be given in any order; intervals spanning a chunk boundary receive a partial sum from each chunk.
+    """
+
+    def __init__(self, start_times, end_times):
+        self.start_times = np.asarray(start_times, dtype=np.float64)
+        self.end_times = np.asarray(end_times, dtype=np.float64)
+        self.interval_sums = None
+        self.interval_event_counts = np.zeros(len(self.start_times), dtype=np.int64)
+
+    def add_chunk(self, met_values, values):
+        chunk = IntervalAggregator(met_values, values)
+        if self.interval_sums is None:
+            self.interval_sums = np.zeros(len(self.start_times), dtype=chunk.prefix_sum.dtype)
+        elif self.interval_sums.dtype != np.float64 and chunk.prefix_sum.dtype == np.float64:
+            self.interval_sums = self.interval_sums.astype(np.float64)
+        if len(chunk.met_values) == 0:
+            return
+        touched = np.flatnonzero((self.end_times >= chunk.met_values[0]) & (self.start_times <= chunk.met_values[-1]))
+        first, last = chunk.bounds(self.start_times[touched], self.end_times[touched])
+        self.interval_sums[touched] += chunk.prefix_sum[last] - chunk.prefix_sum[first]
+        self.interval_event_counts[touched] += last - first
+
+    def sums(self):
+        if self.interval_sums is None:
+            return np.zeros(len(self.start_times))
+        return self.interval_sums
+
+    def event_counts(self):
+        return self.interval_event_counts
+
+    def means(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.sums() / self.interval_event_counts
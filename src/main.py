@@ -1,85 +1,28 @@
 import sys
 import os
 import threading
-import gc
 import yaml
-from PyQt5.QtCore import QSize, pyqtSignal, QObject, QThread
-from PyQt5.QtGui import QKeySequence, QIcon
+from PyQt5.QtCore import QSize, Qt, pyqtSignal
+from PyQt5.QtGui import QKeySequence
 from PyQt5.QtWidgets import (
     QMainWindow, QLabel, QTextEdit, QPushButton, QFileDialog, QAction,
-    QProgressBar, QVBoxLayout, QHBoxLayout, QFrame, QApplication, QTreeWidget,
-    QTreeWidgetItem, QShortcut
+    QProgressBar, QVBoxLayout, QHBoxLayout, QFrame, QApplication, QTreeView, QShortcut, QInputDialog
 )
 import sorting_algorithm
 import tensor_creator
 from selection_menu import SelectionFrame
 from tensor_selection_menu import TensorSelectionFrame
 from tensor_analyzer import PearsonsMatrixCreator
-
-
-class DirectoryLoaderWorker(QObject):
-    update_progress = pyqtSignal(int)
-    update_tree = pyqtSignal(object)
-    finished = pyqtSignal()
-
-    def __init__(self, path, config_file):
-        super().__init__()
-        self.path = path
-        self.total_items = 0
-        self.loaded_items = 0
-        self.icon_folder = QIcon('res/folder.png')
-        if config_file:
-            self.cfg = config_file
-            self.res_path_base = self.cfg['ImageIcons']['res_path_base']
-            self.extension_mapping = self.cfg['ImageIcons']['extension_mapping']
-        else:
-            self.res_path_base = ""
-            self.extension_mapping = {}
-
-    def count_items(self, path):
-        for root, dirs, files in os.walk(path):
-            self.total_items += len(dirs) + len(files)
-
-    def load_directory(self):
-        def add_items(parent_item, path):
-            items = sorted(os.listdir(path))
-            for item in items:
-                full_path = os.path.join(path, item)
-                child_item = QTreeWidgetItem(parent_item, [item])
-                if os.path.isdir(full_path):
-                    child_item.setIcon(0, self.icon_folder)
-                    add_items(child_item, full_path)
-                else:
-                    child_item.setIcon(0, self.set_icons(item))
-                self.loaded_items += 1
-                progress = int((self.loaded_items / self.total_items) * 100)
-                self.update_progress.emit(progress)
-
-        self.count_items(self.path)
-        root = QTreeWidgetItem([self.path])
-        add_items(root, self.path)
-        self.update_tree.emit(root)
-        gc.collect()
-        self.finished.emit()
-
-    def set_icons(self, item) -> QIcon:
-        _, extension = os.path.splitext(item)
-        extension = extension.lower()
-        if extension in self.extension_mapping:
-            icon_path = os.path.join(self.res_path_base, self.extension_mapping[extension])
-            return QIcon(icon_path)
-        elif extension == "":
-            return QIcon(os.path.join(self.res_path_base, "FILE.png"))
-        else:
-            return QIcon(os.path.join(self.res_path_base, "unknownfile.png"))
+from file_tree_model import LazyFileTreeModel
+from event_bus import EventBus
 
 
 class MainWindow(QMainWindow):
     update_progress_signal = pyqtSignal(int)
     update_label_signal = pyqtSignal(str)
-    update_tree_signal = pyqtSignal(object)
     update_second_progress_signal = pyqtSignal(int)
     update_second_label_signal = pyqtSignal(str)
+    event_batch_signal = pyqtSignal(list, dict)
 
     def __init__(self, ui_config: str = "config/UiConfig.yml"):
         super().__init__()
@@ -89,9 +32,7 @@ class MainWindow(QMainWindow):
         else:
             raise ValueError("Error occurred while loading UI configuration script.")
 
-        self.directory_loader_thread = None
-        self.directory_loader_worker = None
-        self.directory_loader = None
+        self.file_tree_model = None
         self.matrix_thread = None
         self.sorting_thread = None
         self.selection_frame = None
@@ -111,7 +52,7 @@ class MainWindow(QMainWindow):
 
         self.file_dialog_frame = QFrame(self)
         self.file_dialog_label = QLabel("Current path: ", self.file_dialog_frame)
-        self.file_tree = QTreeWidget(self.file_dialog_frame)
+        self.file_tree = QTreeView(self.file_dialog_frame)
         self.file_tree.setHeaderHidden(True)
         file_dialog_layout = QVBoxLayout(self.file_dialog_frame)
         file_dialog_layout.addWidget(self.file_dialog_label)
@@ -176,22 +117,21 @@ class MainWindow(QMainWindow):
         self.create_menubar()
 
         self.update_progress_signal.connect(self.progress_bar.setValue)
-        self.update_tree_signal.connect(self.update_file_tree)
         self.update_second_progress_signal.connect(self.second_progress_bar.setValue)
         self.update_label_signal.connect(self.progress_label.setText)
         self.update_second_label_signal.connect(self.second_progress_label.setText)
 
-        self.sorting_alg = sorting_algorithm.SortingAlgorithm(self.terminal, os.getcwd())
-        self.sorting_alg.update_progress.connect(self.update_progress_signal)
-        self.sorting_alg.update_second_progress.connect(self.update_second_progress_signal)
-        self.sorting_alg.update_label.connect(self.update_label_signal)
-        self.sorting_alg.update_second_label.connect(self.update_second_label_signal)
+        # worker threads log and report progress through the bus, which reaches the GUI thread
+        # as one queued signal per batch instead of one event per line or per file
+        self.event_bus = EventBus(self.event_batch_signal.emit, interval_ms=100)
+        self.event_batch_signal.connect(self.apply_event_batch, Qt.QueuedConnection)
+        self.event_bus.start()
+
+        self.sorting_alg = sorting_algorithm.SortingAlgorithm(self.event_bus, os.getcwd())
+        self.event_bus.connect_worker(self.sorting_alg, Qt.DirectConnection)
 
-        self.tensor_creator = tensor_creator.TensorCreator(self.terminal, os.getcwd())
-        self.tensor_creator.update_progress.connect(self.update_progress_signal)
-        self.tensor_creator.update_second_progress.connect(self.update_second_progress_signal)
-        self.tensor_creator.update_label.connect(self.update_label_signal)
-        self.tensor_creator.update_second_label.connect(self.update_second_label_signal)
+        self.tensor_creator = tensor_creator.TensorCreator(self.event_bus, os.getcwd())
+        self.event_bus.connect_worker(self.tensor_creator, Qt.DirectConnection)
 
         self.start_directory_loading(os.getcwd())
 
@@ -199,6 +139,22 @@ class MainWindow(QMainWindow):
         self.shortcut_save.activated.connect(self.save_txt_file)
         self.load_qt_stylesheet(self.stylesheet)
 
+    def apply_event_batch(self, lines, updates):
+        if lines:
+            self.terminal.append("\n".join(lines))
+        if "progress" in updates:
+            self.update_progress_signal.emit(updates["progress"])
+        if "second_progress" in updates:
+            self.update_second_progress_signal.emit(updates["second_progress"])
+        if "label" in updates:
+            self.update_label_signal.emit(updates["label"])
+        if "second_label" in updates:
+            self.update_second_label_signal.emit(updates["second_label"])
+
+    def closeEvent(self, event):
+        self.event_bus.stop()
+        super().closeEvent(event)
+
     def create_menubar(self):
         menubar = self.menuBar()
         file_menu = menubar.addMenu("&File")
@@ -267,11 +223,6 @@ class MainWindow(QMainWindow):
         else:
             self.terminal.append(f"Error: Cannot load theme {stylesheet}")
 
-    def update_file_tree(self, root_item):
-        self.file_tree.clear()
-        self.file_tree.addTopLevelItem(root_item)
-        self.file_tree.expandAll()
-
     def open_catalog(self):
         selected_dir = QFileDialog.getExistingDirectory(self, "Select Directory", os.getcwd())
         if selected_dir:
@@ -302,18 +253,9 @@ class MainWindow(QMainWindow):
             self.save_txt_file()
 
     def start_directory_loading(self, path):
-        self.directory_loader_worker = DirectoryLoaderWorker(path, self.cfg)
-        self.directory_loader_thread = QThread()
-
-        self.directory_loader_worker.moveToThread(self.directory_loader_thread)
-
-        self.directory_loader_worker.update_progress.connect(self.update_progress_signal)
-        self.directory_loader_worker.update_tree.connect(self.update_tree_signal)
-        self.directory_loader_worker.finished.connect(self.directory_loader_thread.quit)
-
-        self.directory_loader_thread.started.connect(self.directory_loader_worker.load_directory)
-
-        self.directory_loader_thread.start()
+        self.file_tree_model = LazyFileTreeModel(path, self.cfg, self)
+        self.file_tree.setModel(self.file_tree_model)
+        self.file_tree.expand(self.file_tree_model.index(0, 0))
 
     def confirm_sorting_DB(self):
         self.selection_frame = SelectionFrame(self.stylesheet)
@@ -332,6 +274,8 @@ class MainWindow(QMainWindow):
         self.tensor_creator.set_timespan_attribute(options['timespan'])
         self.tensor_creator.set_hex(options['hex'])
         self.tensor_creator.set_channel_division(options['divide_by_channels'])
+        self.tensor_creator.set_output_format(options['output_format'])
+        self.tensor_creator.set_workers(options['workers'])
         self.start_sorting_data_DS()
 
     def start_sorting_data_with_options(self, options):
@@ -342,6 +286,8 @@ class MainWindow(QMainWindow):
         self.sorting_alg.set_filenames_for_sorting(options['file_types'])
         self.sorting_alg.set_channels(options['channels'])
         self.sorting_alg.set_particle_events(options['particle_events'])
+        self.sorting_alg.set_workers(options['workers'])
+        self.sorting_alg.set_build_indexes(options['build_indexes'])
         self.start_sorting_data_DB()
 
     def start_sorting_data_DB(self):
@@ -367,7 +313,7 @@ class MainWindow(QMainWindow):
         if name:
             self.sorting_alg.set_database_connection(name)
             self.sorting_alg.first_stage_processing()
-            self.terminal.append("Sorting completed. Saving results...")
+            self.event_bus.append("Sorting completed. Saving results...")
             save_file_path, _ = QFileDialog.getSaveFileName(self, "Save text file with correct data paths", "",
                                                             "Text Files (*.txt)")
             self.sorting_alg.save_loading_log()
@@ -376,8 +322,7 @@ class MainWindow(QMainWindow):
                                                     args=(save_file_path,))
                 self.save_thread.start()
         else:
-            self.terminal.append("Choose database file first!")
-        gc.collect()
+            self.event_bus.append("Choose database file first!")
 
     def run_sorting_process_DS(self):
         self.tensor_creator.set_path(self.path)
@@ -386,10 +331,9 @@ class MainWindow(QMainWindow):
         if name:
             self.tensor_creator.set_file_prefix(name)
             self.tensor_creator.create_data_tensor()
-            self.terminal.append("Tensor creation completed. Saving results...")
+            self.event_bus.append("Tensor creation completed. Saving results...")
         else:
-            self.terminal.append("Choose PyTorch Tensor file first!")
-        gc.collect()
+            self.event_bus.append("Choose PyTorch Tensor file first!")
 
     def load_dataset(self):
         # name, _ = QFileDialog.getOpenFileName(self, "Select Dataset file", "", "Pickled datasets (*.pt)")
@@ -403,10 +347,8 @@ class MainWindow(QMainWindow):
         pass
 
     def init_pearsons_matrix_creation(self):
-        if not self.pearson_matrix_handler:
-            hi_instruction_file = "../dataset_manuals/HiCullGoodTimes.txt"
-            lo_instruction_file = "../dataset_manuals/LoGoodTimes.txt"
-            self.pearson_matrix_handler = PearsonsMatrixCreator(self.terminal, hi_instruction_file, lo_instruction_file)
+        hi_instruction_file = "../dataset_manuals/HiCullGoodTimes.txt"
+        lo_instruction_file = "../dataset_manuals/LoGoodTimes.txt"
 
         hi_directory = QFileDialog.getExistingDirectory(self, "Select Hi dataset folder")
         lo_directory = QFileDialog.getExistingDirectory(self, "Select Lo dataset folder")
@@ -414,14 +356,21 @@ class MainWindow(QMainWindow):
         if hi_directory and lo_directory:
             filename_prefix_hi = "hide_hex_channel_"
             filename_prefix_lo = "lode_hex_channel_"
+            chunk_size, ok = QInputDialog.getInt(self, "Pearson matrix",
+                                                 "Rows per streamed chunk (0 loads each channel whole):",
+                                                 value=0, min=0, max=2 ** 31 - 1, step=100000)
 
-            self.terminal.append("Initializing Pearson matrix creation...")
-            self.pearson_matrix_handler.calculate_pearsons_for_all_channels(hi_directory, lo_directory,
-                                                                            filename_prefix_hi, filename_prefix_lo)
+            self.pearson_matrix_handler = PearsonsMatrixCreator(self.event_bus, hi_directory, lo_directory,
+                                                                filename_prefix_hi, filename_prefix_lo,
+                                                                hi_instruction_file, lo_instruction_file)
+            self.pearson_matrix_handler.set_chunk_size(chunk_size if ok else 0)
+            self.event_bus.append("Initializing Pearson matrix creation...")
+            self.pearson_matrix_handler.calculate_pearsons_for_all_channels()
 
     def print_data_structure_description(self):
         if not self.pearson_matrix_handler:
-            self.pearson_matrix_handler = PearsonsMatrixCreator(self.terminal, "HiCullGoodTimes.txt", "LoGoodTimes.txt")
+            self.pearson_matrix_handler = PearsonsMatrixCreator(self.event_bus, None, None, None, None,
+                                                                "HiCullGoodTimes.txt", "LoGoodTimes.txt")
         self.pearson_matrix_handler.print_short_data_manual()
 
     def clear_terminals(self):
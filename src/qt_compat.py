@@ -0,0 +1,50 @@
+import os
+
+# IBEX_HEADLESS=1 skips importing Qt entirely, e.g. for batch jobs on nodes without a display
+HEADLESS = os.environ.get("IBEX_HEADLESS") == "1"
+
+if not HEADLESS:
+    try:
+        from PyQt5.QtCore import pyqtSignal, QObject
+    except ImportError:
+        HEADLESS = True
+
+if HEADLESS:
+    class BoundSignal:
+        def __init__(self):
+            self.slots = []
+
+        def connect(self, slot, type=None):
+            self.slots.append(slot)
+
+        def disconnect(self, slot=None):
+            if slot is None:
+                self.slots.clear()
+            else:
+                self.slots.remove(slot)
+
+        def emit(self, *args):
+            for slot in list(self.slots):
+                slot(*args)
+
+    class pyqtSignal:
+        """Plain-Python stand-in for PyQt5's pyqtSignal with direct, synchronous delivery."""
+
+        def __init__(self, *types):
+            self.types = types
+            self.name = None
+
+        def __set_name__(self, owner, name):
+            self.name = name
+
+        def __get__(self, instance, owner):
+            if instance is None:
+                return self
+            signal = instance.__dict__.get(self.name)
+            if signal is None:
+                signal = instance.__dict__[self.name] = BoundSignal()
+            return signal
+
+    class QObject:
+        def __init__(self, parent=None):
+            self.parent = parent
@@ -1,9 +1,12 @@
+import os
 from PyQt5 import QtCore, QtGui
 from PyQt5.QtCore import QSize, Qt, pyqtSignal
 from PyQt5.QtWidgets import (
     QLabel, QPushButton, QComboBox, QVBoxLayout, QHBoxLayout, QMainWindow, QFrame
 )
 
+WORKER_COUNTS = [str(n) for n in (1, 2, 4, 8, 16, 32, 64) if n <= (os.cpu_count() or 1)]
+
 
 class CheckableComboBox(QComboBox):
     def __init__(self, parent=None):
@@ -59,7 +62,9 @@ class SelectionFrame(QMainWindow):
         self.QualH_num = ["Q-ABC", "Q-AB", "Q-BC", "Q-AC", "None"]
         self.event_types = ['Direct events', 'Histogram events']
         self.file_types = ["hide", "lode", "hihb", "lohb"]
-        self.setFixedSize(QSize(380, 500))
+        self.worker_counts = WORKER_COUNTS
+        self.index_options = ["No", "Yes"]
+        self.setFixedSize(QSize(380, 620))
         self.setWindowTitle("Select sorting options:")
         self.init_sub_ui()
         self.load_qt_stylesheet(self.stylesheet)
@@ -88,6 +93,8 @@ class SelectionFrame(QMainWindow):
         self.event_combobox = self.add_combobox(selection_layout, "Event types", self.event_types)
         self.qualh_combobox = self.add_checkable_combobox(selection_layout, "QualH", self.QualH_num)
         self.filetype_combobox = self.add_checkable_combobox(selection_layout, "File Types", self.file_types)
+        self.workers_combobox = self.add_combobox(selection_layout, "Worker processes", self.worker_counts)
+        self.index_combobox = self.add_combobox(selection_layout, "Build indexes after load", self.index_options)
 
         self.channels_combobox = CheckableComboBox()
         self.particle_events_combobox = CheckableComboBox()
@@ -156,6 +163,8 @@ class SelectionFrame(QMainWindow):
         file_types = self.filetype_combobox.items()
         channels = self.channels_combobox.items()
         particle_events = self.particle_events_combobox.items()
+        workers = int(self.workers_combobox.currentText())
+        build_indexes = self.index_combobox.currentText() == "Yes"
         options = {
             'instruction': instruction,
             'quaternion': quaternion,
@@ -163,7 +172,9 @@ class SelectionFrame(QMainWindow):
             'qualh': qualh,
             'file_types': file_types,
             'channels': channels,
-            'particle_events': particle_events
+            'particle_events': particle_events,
+            'workers': workers,
+            'build_indexes': build_indexes
         }
         self.sorting_options_selected.emit(options)
         self.close()
@@ -1,10 +1,190 @@
 import os
 import re
 import time
-import pandas as pd
+import queue
+import multiprocessing
 import sqlite3
-from PyQt5.QtCore import pyqtSignal, QObject
-import numpy as np
+from qt_compat import pyqtSignal, QObject
+from good_times import load_good_times
+from good_times_index import GoodTimesIndex
+from ibex_reader import read_ibex_file, code_lookup_table
+from database_writer import DatabaseWriter
+from file_catalog import FileCatalog
+from stage_profiler import StageProfiler
+
+worker_state = {}
+# how long the parent waits on a writer queue before checking that the writer process is still alive
+WRITER_POLL_SECONDS = 1.0
+
+
+class SortingError(RuntimeError):
+    """A file could not be read or filtered in a worker process; the message names the file."""
+
+
+def qualh_condition(qualh, instruction):
+    """ty codes kept by the Hi coincidence or Lo TOF options in qualh."""
+    condition = []
+    instruction = os.path.basename(instruction)
+    if instruction == "HiCullGoodTimes.txt":
+        if "Q-ABC" in qualh:
+            condition.extend(["0A", "0E", "05"])
+        if "Q-AB" in qualh:
+            condition.extend(["09", "0D", "04"])
+        if "Q-BC" in qualh:
+            condition.extend(["03"])
+        if "Q-AC" in qualh:
+            condition.extend(["08"])
+        if "None" in qualh:
+            condition.extend(["0C", "0F", "07", "02", "06", "00", "0B", "01"])
+    elif instruction == "LoGoodTimes.txt":
+        TOF0 = {"40", "41", "42", "43", "44", "45", "46", "47"}
+        TOF1 = {"40", "41", "42", "43", "49", "4A", "4B"}
+        TOF2 = {"40", "41", "44", "45", "48", "49", "4C", "4D"}
+        TOF3 = {"40", "42", "44", "46", "48", "4A", "4C", "4E"}
+        tof_condition = {"40", "41", "42", "43", "44", "45", "46", "47", "48", "49", "4A", "4B", "4C", "4D", "4E"}
+        if "TOF0" in qualh:
+            tof_condition.intersection_update(TOF0)
+        if "TOF1" in qualh:
+            tof_condition.intersection_update(TOF1)
+        if "TOF2" in qualh:
+            tof_condition.intersection_update(TOF2)
+        if "TOF3" in qualh:
+            tof_condition.intersection_update(TOF3)
+        condition = list(tof_condition)
+    return condition
+
+
+def channel_numbers(channels):
+    if "All" in channels and "Channel" not in channels:
+        return list(range(1, 9))
+    return [i for i in range(1, 9) if f"Channel {i}" in channels]
+
+
+def particle_event_codes(part_eve, channels, instruction):
+    """ch codes for the selected particle species (Lo) or for plain detections (Hi) in the given channels."""
+    if os.path.basename(instruction) == "LoGoodTimes.txt":
+        codes = []
+        if "Hydrogen" in part_eve:
+            codes.extend([f"2{i}" for i in channels])
+        if "Oxygen" in part_eve:
+            codes.extend([f"4{i}" for i in channels])
+        return codes
+    return [f"1{i}" for i in channels]
+
+
+def profile_table(name):
+    return "data_" + re.sub(r'\W+', '_', name).strip('_').lower()
+
+
+def open_database_writers(name, tables):
+    """One DatabaseWriter per table, sharing a single connection so their transactions never contend."""
+    writers = {}
+    connection = None
+    for table in tables:
+        writers[table] = DatabaseWriter(name, table=table, connection=connection)
+        connection = writers[table].conn
+    return writers
+
+
+def close_database_writers(writers):
+    # the first writer owns the shared connection, so it closes last
+    for writer in reversed(list(writers.values())):
+        writer.close()
+
+
+def init_filter_worker(filters, selections):
+    worker_state["good_times_index"] = GoodTimesIndex(filters)
+    worker_state["selections"] = {table: (code_lookup_table(condition), code_lookup_table(particle_event))
+                                  for table, condition, particle_event in selections}
+
+
+def filter_file_worker(task):
+    filepath, tables = task
+    try:
+        return filter_file(filepath, tables)
+    except Exception as e:
+        # only the message survives the trip back to the parent, so it has to carry the path
+        raise SortingError(f"{filepath}: {type(e).__name__}: {e}") from e
+
+
+def filter_file(filepath, tables):
+    timings = {}
+    start = round(time.time()*1000)
+    lines = read_ibex_file(filepath, timings)
+    load_time = round(time.time()*1000) - start
+    filter_start = time.perf_counter()
+    good_times_mask = worker_state["good_times_index"].mask_for_path(filepath, lines["MET"])
+    data = {}
+    for table in tables:
+        ty_table, ch_table = worker_state["selections"][table]
+        data[table] = lines[good_times_mask & ty_table[lines["ty"]] & ch_table[lines["ch"]]]
+    timings["filter"] = time.perf_counter() - filter_start
+    return filepath, load_time, len(lines), data, timings
+
+
+def database_writer_process(name, tables, write_queue, error_queue):
+    writers = {}
+    profiler = StageProfiler()
+    try:
+        writers = open_database_writers(name, tables)
+        while True:
+            item = write_queue.get()
+            if item is None:
+                break
+            filepath, size, mtime_ns, selected = item
+            for table, data in selected.items():
+                try:
+                    with profiler.stage("db write", data.nbytes, len(data)):
+                        writers[table].write(data, filepath, size, mtime_ns)
+                except sqlite3.Error as e:
+                    error_queue.put(f"SQLite error: {e}")
+    except Exception as e:
+        error_queue.put(f"Database writer failed: {type(e).__name__}: {e}")
+        raise
+    finally:
+        close_database_writers(writers)
+        # timings travel back as dicts, messages as strings
+        error_queue.put(profiler.stages.get("db write", {}))
+        error_queue.put(None)
+
+
+def writer_exited(writer):
+    return SortingError(f"database writer process exited with code {writer.exitcode}")
+
+
+def send_to_writer(writer, write_queue, item):
+    """Put item on the bounded write queue, raising SortingError instead of blocking on a dead writer."""
+    while True:
+        try:
+            write_queue.put(item, timeout=WRITER_POLL_SECONDS)
+            return
+        except queue.Full:
+            if not writer.is_alive():
+                raise writer_exited(writer)
+
+
+def stop_database_writer(writer, write_queue, error_queue):
+    """Send the writer its sentinel and return its messages, up to its own sentinel or its exit."""
+    try:
+        send_to_writer(writer, write_queue, None)
+    except SortingError:
+        pass  # the exit code is checked by the caller
+    messages = []
+    while True:
+        # a writer seen dead before get() has already flushed everything it put
+        writer_alive = writer.is_alive()
+        try:
+            message = error_queue.get(timeout=WRITER_POLL_SECONDS)
+        except queue.Empty:
+            if writer_alive:
+                continue
+            break
+        if message is None:
+            break
+        messages.append(message)
+    writer.join()
+    return messages
+
 
 class SortingAlgorithm(QObject):
     update_progress = pyqtSignal(int)
@@ -21,6 +201,7 @@ class SortingAlgorithm(QObject):
         self.noquaternion = None
         self.instruction = "HiCullGoodTimes.txt"
         self.filters = None
+        self.good_times_index = None
         self.terminal = terminal
         self.path = path
         self.correct_dir_paths = []
@@ -37,6 +218,15 @@ class SortingAlgorithm(QObject):
         self.channels = []
         self.time_log = []
         self.database = None
+        self.database_writer = None
+        self.database_writers = {}
+        self.selection_profiles = []  # named profiles; when empty the setters define the single selection
+        self.profiler = StageProfiler()
+        self.profile_path = None
+        self.workers = 1
+        self.build_indexes = False
+        self.catalog = None
+        self.skipped_files = 0
 
     def set_instruction_file(self, instruction):
         self.instruction = instruction
@@ -52,86 +242,118 @@ class SortingAlgorithm(QObject):
         self.event = event
 
     def set_qualh(self, qualh, instruction):
-        self.condition.clear()
-        if instruction == "HiCullGoodTimes.txt":
-            if "Q-ABC" in qualh:
-                self.condition.extend(["0A", "0E", "05"])
-            if "Q-AB" in qualh:
-                self.condition.extend(["09", "0D", "04"])
-            if "Q-BC" in qualh:
-                self.condition.extend(["03"])
-            if "Q-AC" in qualh:
-                self.condition.extend(["08"])
-            if "None" in qualh:
-                self.condition.extend(["0C", "0F", "07", "02", "06", "00", "0B", "01"])
-        elif instruction == "LoGoodTimes.txt":
-            TOF0 = {"40", "41", "42", "43", "44", "45", "46", "47"}
-            TOF1 = {"40", "41", "42", "43", "49", "4A", "4B"}
-            TOF2 = {"40", "41", "44", "45", "48", "49", "4C", "4D"}
-            TOF3 = {"40", "42", "44", "46", "48", "4A", "4C", "4E"}
-            self.condition = {"40", "41", "42", "43", "44", "45", "46", "47", "48", "49", "4A", "4B", "4C", "4D", "4E"}
-            if "TOF0" in qualh:
-                self.condition.intersection_update(TOF0)
-            if "TOF1" in qualh:
-                self.condition.intersection_update(TOF1)
-            if "TOF2" in qualh:
-                self.condition.intersection_update(TOF2)
-            if "TOF3" in qualh:
-                self.condition.intersection_update(TOF3)
-
-            self.condition = list(self.condition)
-
+        self.condition = qualh_condition(qualh, instruction)
         print(self.condition)
 
     def set_particle_events(self, part_eve):
-        if self.instruction == "LoGoodTimes.txt":
-            if "Hydrogen" in part_eve:
-                self.particle_event.extend([f"2{i}" for i in self.channels])
-            if "Oxygen" in part_eve:
-                self.particle_event.extend([f"4{i}" for i in self.channels])
+        if os.path.basename(self.instruction) == "LoGoodTimes.txt":
+            self.particle_event.extend(particle_event_codes(part_eve, self.channels, self.instruction))
         else:
-            self.particle_event = [f"1{i}" for i in self.channels]
+            self.particle_event = particle_event_codes(part_eve, self.channels, self.instruction)
         print(self.particle_event)
 
     def set_channels(self, channels):
-        for i in range(1, 9):
-            if f"Channel {i}" in channels and "All" not in channels:
-                self.channels.append(i)
-        if "All" in channels and "Channel" not in channels:
-            for i in range(1, 9):
-                self.channels.append(i)
+        self.channels.extend(channel_numbers(channels))
         print(self.channels)
 
+    def set_selection_profiles(self, profiles):
+        """Sort several (name, qualh, channels, particle_events) selections in one pass, one table each.
+
+        Files are read for the union of the profiles' channels; every profile is written to data_<name>.
+        """
+        self.selection_profiles = []
+        for name, qualh, channels, part_eve in profiles:
+            table = profile_table(name)
+            if any(profile["table"] == table for profile in self.selection_profiles):
+                self.terminal.append(f"Selection profile '{name}' would reuse table {table}; skipped.")
+                continue
+            profile_channels = channel_numbers(channels)
+            self.selection_profiles.append({
+                "name": name,
+                "table": table,
+                "condition": qualh_condition(qualh, self.instruction),
+                "particle_event": particle_event_codes(part_eve, profile_channels, self.instruction),
+            })
+            self.channels.extend(channel for channel in profile_channels if channel not in self.channels)
+
+    def active_profiles(self):
+        if self.selection_profiles:
+            return self.selection_profiles
+        return [{"name": None, "table": "data", "condition": self.condition,
+                 "particle_event": self.particle_event}]
+
     def set_filenames_for_sorting(self, filenames):
         self.filenames_for_sorting = filenames
 
-    def create_table(self):
-        columns = ["MET", "RA", "Decl", "ch", "ty", "count", "selnbits", "phase", "locXRE", "locYRE", "locZRE"]
-        column_definitions = ', '.join([f'{column} TEXT' for column in columns])
-        query = f'CREATE TABLE IF NOT EXISTS data ({column_definitions})'
+    def set_workers(self, workers):
+        self.workers = max(1, int(workers))
+
+    def set_build_indexes(self, build_indexes):
+        self.build_indexes = build_indexes
+
+    def set_profile_path(self, profile_path):
+        self.profile_path = profile_path
+
+    def set_database_connection(self, name):
+        self.database = name
         try:
-            self.cursor.execute(query)
-            self.conn.commit()
+            tables = [profile["table"] for profile in self.active_profiles()]
+            self.database_writers = open_database_writers(name, tables)
+            self.database_writer = next(iter(self.database_writers.values()))
         except sqlite3.Error as e:
             self.terminal.append(f"SQLite error: {e}")
 
-    def set_database_connection(self, name):
-        self.conn = sqlite3.connect(name)
-        self.cursor = self.conn.cursor()
-        self.create_table()
+    def finish_database_load(self):
+        try:
+            if self.build_indexes and not self.stop_flag:
+                self.terminal.append("Building MET and (ch, ty) indexes...")
+                for writer in self.database_writers.values():
+                    writer.commit()
+                    writer.build_indexes()
+            for writer in self.database_writers.values():
+                writer.finish_load()
+        except sqlite3.Error as e:
+            self.terminal.append(f"SQLite error: {e}")
 
     def first_stage_processing(self):
         self.terminal.append("Starting first stage processing...")
         self.time_log.append("Time:\tFile:\tNumber of lines:\n")
-        self.total_dirs = sum(len(dirs) for _, dirs, _ in os.walk(self.path))
+        self.profiler = StageProfiler()
+        with self.profiler.stage("scan"):
+            self.catalog = FileCatalog(self.path).scan()
+        self.terminal.append(f"Catalog ready ({self.catalog.rescanned_dirs} directories rescanned).")
+        self.total_dirs = self.catalog.count_dirs()
+        self.skipped_files = 0
         self.scanned_dirs = 0
         self.correct_dir_paths.clear()
         self.filters = self.load_filtering_instructions(self.instruction)
         if self.filters is None:
             self.terminal.append("Error: Filters could not be loaded.")
             return
-
-        for root, dirs, files in os.walk(self.path):
+        try:
+            if self.workers > 1:
+                self.parallel_first_stage_processing()
+            else:
+                self.serial_first_stage_processing()
+        finally:
+            if self.skipped_files:
+                self.terminal.append(f"Skipped {self.skipped_files} files already recorded in the database.")
+            with self.profiler.stage("db write"):
+                self.finish_database_load()
+            self.report_profile()
+
+    def report_profile(self):
+        for line in self.profiler.summary_lines():
+            self.terminal.append(line)
+        if self.profile_path:
+            try:
+                self.profiler.export(self.profile_path)
+                self.terminal.append(f"Stage timings saved to {self.profile_path}")
+            except OSError as e:
+                self.terminal.append(f"Could not save stage timings: {e}")
+
+    def serial_first_stage_processing(self):
+        for root, dirs, files in self.catalog.walk():
             if self.stop_flag:
                 self.terminal.append("Sorting process stopped.")
                 return
@@ -141,12 +363,13 @@ class SortingAlgorithm(QObject):
             self.update_second_progress.emit(0)
             self.update_label.emit(proglabel)
 
-            if any(file.endswith(self.quaternion) for file in files) and not any(
-                    file.endswith(self.noquaternion) for file in files):
+            if self.catalog.has_quaternion(root, self.quaternion) and \
+                    not self.catalog.has_quaternion(root, self.noquaternion):
                 double_obs_info = self.check_double_observation(root)
                 self.correct_dir_paths.append((os.path.abspath(root), double_obs_info))
                 self.terminal.append(
-                    f"Found '{self.quaternion}' file in: {self.correct_dir_paths[-1][0]} (Double Observation: {double_obs_info})")
+                    f"Found '{self.quaternion}' file in: {self.correct_dir_paths[-1][0]} "
+                    f"(Orbit: {self.catalog.orbit(root)}, Double Observation: {double_obs_info})")
                 self.total_files = len(files)
                 self.scanned_files = 0
                 for file in files:
@@ -160,6 +383,92 @@ class SortingAlgorithm(QObject):
                         self.second_stage_processing(file, os.path.abspath(root))
                     self.scanned_files += 1
 
+    def parallel_first_stage_processing(self):
+        tasks = []
+        file_stats = {}
+        for root, dirs, files in self.catalog.walk():
+            if self.stop_flag:
+                self.terminal.append("Sorting process stopped.")
+                return
+            self.scanned_dirs += 1
+            self.update_progress.emit(int((self.scanned_dirs / max(self.total_dirs, 1)) * 100))
+            self.update_label.emit(f"Scanning directory: {root}")
+
+            if self.catalog.has_quaternion(root, self.quaternion) and \
+                    not self.catalog.has_quaternion(root, self.noquaternion):
+                double_obs_info = self.check_double_observation(root)
+                self.correct_dir_paths.append((os.path.abspath(root), double_obs_info))
+                self.terminal.append(
+                    f"Found '{self.quaternion}' file in: {self.correct_dir_paths[-1][0]} "
+                    f"(Orbit: {self.catalog.orbit(root)}, Double Observation: {double_obs_info})")
+                for file in files:
+                    if any(str(num) in file for num in self.channels) and \
+                            self.is_file_for_sorting(file, os.path.abspath(root)):
+                        filepath = os.path.join(os.path.abspath(root), file)
+                        file_stats[filepath] = self.file_stat(filepath)
+                        tables = self.pending_tables(filepath, file_stats[filepath])
+                        if tables:
+                            tasks.append((filepath, tables))
+                        else:
+                            self.skipped_files += 1
+
+        self.process_files_in_pool(tasks, file_stats)
+
+    def process_files_in_pool(self, tasks, file_stats):
+        """Filter (filepath, tables) tasks in worker processes and write each selection to its table.
+
+        file_stats maps each filepath to the (size, mtime_ns) recorded in the ledger with its rows.
+        """
+        self.terminal.append(f"Processing {len(tasks)} files with {self.workers} worker processes...")
+        self.total_files = len(tasks)
+        self.scanned_files = 0
+        self.update_progress.emit(0)
+        self.update_second_progress.emit(0)
+
+        # spawn keeps the workers independent of the Qt threads running in this process
+        context = multiprocessing.get_context("spawn")
+        write_queue = context.Queue(maxsize=2 * self.workers)
+        error_queue = context.Queue()
+        selections = [(profile["table"], list(profile["condition"]), list(profile["particle_event"]))
+                      for profile in self.active_profiles()]
+        writer = context.Process(target=database_writer_process,
+                                 args=(self.database, list(self.database_writers), write_queue, error_queue))
+        writer.start()
+        pool = context.Pool(processes=self.workers, initializer=init_filter_worker,
+                            initargs=(self.filters, selections))
+        try:
+            for filepath, load_time, line_count, data, timings in pool.imap(filter_file_worker, tasks):
+                if self.stop_flag:
+                    pool.terminate()
+                    self.terminal.append("Sorting process stopped.")
+                    break
+                self.terminal.append(f"Found file in: {filepath}")
+                self.time_log.append(f"{load_time}\t{os.path.basename(filepath)}\t{line_count}\n")
+                self.record_file_timings(timings, file_stats[filepath][0], line_count)
+                send_to_writer(writer, write_queue, (filepath, *file_stats[filepath], data))
+                self.scanned_files += 1
+                self.update_second_label.emit(f"Processing file: {os.path.basename(filepath)}")
+                self.update_progress.emit(int((self.scanned_files / self.total_files) * 100))
+            else:
+                pool.close()
+        except BaseException:
+            # a failed worker or writer leaves the pool running; terminate it so join() returns
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+            # the writer commits what it received and exits on the sentinel, even after a failure
+            for message in stop_database_writer(writer, write_queue, error_queue):
+                if isinstance(message, dict):
+                    if message:
+                        self.profiler.add("db write", message["seconds"], message["bytes"], message["rows"],
+                                          message["calls"])
+                else:
+                    self.terminal.append(message)
+            if writer.exitcode != 0:
+                raise writer_exited(writer)
+        self.update_second_progress.emit(100)
+
     def save_correct_paths_to_file(self, name):
         with open(name, 'w') as file:
             for i, (path, double_obs_info) in enumerate(self.correct_dir_paths):
@@ -168,7 +477,7 @@ class SortingAlgorithm(QObject):
     def check_double_observation(self, path):
         hi2_file = None
         hi3_file = None
-        for root, _, files in os.walk(path):
+        for root, _, files in self.catalog.walk(path):
             if self.stop_flag:
                 return "Sorting process stopped."
             for file in files:
@@ -182,67 +491,94 @@ class SortingAlgorithm(QObject):
                         return "True"
         return "False"
 
-    def second_stage_processing(self, file, path):
+    def is_file_for_sorting(self, file, path):
         if (any(sub in file for sub in self.filenames_for_sorting) and
                 file.endswith(".txt") and
                 not any(file.endswith(ext) for ext in [self.quaternion, ".star-spin-nep.txt", "ibex_state_GSE.txt"])):
             filepath = os.path.join(path, file)
-            if not self.check_filter_in_filepath(filepath) or not self.check_channel_observation(filepath):
+            return self.check_filter_in_filepath(filepath) and self.check_channel_observation(filepath)
+        return False
+
+    @staticmethod
+    def file_stat(filepath):
+        """Current (size, mtime_ns) of filepath; the catalog's cached values miss files edited in place."""
+        stat = os.stat(filepath)
+        return stat.st_size, stat.st_mtime_ns
+
+    def pending_tables(self, filepath, file_stat):
+        """Tables whose ledger does not yet hold the version of filepath described by file_stat."""
+        return [table for table, writer in self.database_writers.items()
+                if not writer.is_processed(filepath, *file_stat)]
+
+    def second_stage_processing(self, file, path):
+        if self.is_file_for_sorting(file, path):
+            filepath = os.path.join(path, file)
+            # stat before reading, so an edit made during the run is picked up by the next one
+            file_stat = self.file_stat(filepath)
+            tables = self.pending_tables(filepath, file_stat)
+            if not tables:
+                self.skipped_files += 1
                 return
             self.terminal.append(f"Found file in: {filepath}")
+            timings = {}
             start = round(time.time()*1000)
-            lines = np.loadtxt(filepath, dtype="str")
+            lines = read_ibex_file(filepath, timings)
             end = round(time.time()*1000)
             load_time = end - start
             self.time_log.append(f"{load_time}\t{file}\t{len(lines)}\n")
-            data = self.process_filtered_lines(lines, filepath)
-            self.write_to_database(data)
-
-    def process_filtered_lines(self, lines, filepath):
-        filtered_data = []
+            filter_start = time.perf_counter()
+            selected = self.process_filtered_lines(lines, filepath, tables)
+            timings["filter"] = time.perf_counter() - filter_start
+            self.record_file_timings(timings, file_stat[0], len(lines))
+            for table, data in selected.items():
+                with self.profiler.stage("db write", data.nbytes, len(data)):
+                    self.write_to_database(data, filepath, table, file_stat)
+
+    def record_file_timings(self, timings, file_size, line_count):
+        self.profiler.add("parse", timings["parse"], file_size, line_count)
+        self.profiler.add("hex decode", timings["hex decode"], rows=line_count)
+        self.profiler.add("filter", timings["filter"], rows=line_count)
+
+    def process_filtered_lines(self, lines, filepath, tables):
+        """Rows of lines kept by each table's selection profile, sharing one good-times mask."""
         self.total_lines = len(lines)
         self.scanned_lines = 0
 
-        met_values = lines[:, 0].astype(float)
-        ch_values = lines[:, 3]
-        ty_values = lines[:, 4]
-
-        for filter_entry in self.filters:
-            if filter_entry[0] in filepath:
-                start_value = float(filter_entry[1])
-                end_value = float(filter_entry[2])
-                mask = (met_values >= start_value) & (met_values <= end_value)
-                filtered_lines = lines[mask]
-                filtered_ch_values = ch_values[mask]
-                filtered_ty_values = ty_values[mask]
-
-                for line, ty, ch in zip(filtered_lines, filtered_ty_values, filtered_ch_values):
-                    if ty in self.condition and ch in self.particle_event:
-                        filtered_data.append(line)
-
-        return filtered_data
-
-    def write_to_database(self, data):
-        if len(data) == 0:
-            return
-        columns = ["MET", "RA", "Decl", "ch", "ty", "count", "selnbits", "phase", "locXRE", "locYRE", "locZRE"]
-        df = pd.DataFrame(data, columns=columns)
+        good_times_mask = self.good_times_index.mask_for_path(filepath, lines["MET"])
+        selected = {}
+        for profile in self.active_profiles():
+            if profile["table"] in tables:
+                mask = good_times_mask & self.selection_mask(lines["ch"], lines["ty"], profile)
+                selected[profile["table"]] = lines[mask]
+        self.scanned_lines = self.total_lines
+        return selected
+
+    def selection_mask(self, ch_values, ty_values, profile=None):
+        condition = self.condition if profile is None else profile["condition"]
+        particle_event = self.particle_event if profile is None else profile["particle_event"]
+        return code_lookup_table(condition)[ty_values] & code_lookup_table(particle_event)[ch_values]
+
+    def write_to_database(self, data, filepath=None, table=None, file_stat=None):
+        database_writer = self.database_writer if table is None else self.database_writers[table]
         try:
-            df.to_sql('data', self.conn, if_exists='append', index=False)
+            if filepath is None:
+                database_writer.write(data)
+            else:
+                database_writer.write(data, filepath, *(file_stat or self.file_stat(filepath)))
         except sqlite3.Error as e:
             self.terminal.append(f"SQLite error: {e}")
 
     def load_filtering_instructions(self, filename):
         try:
-            lines = np.loadtxt(filename, dtype='str')
-            self.filters = lines
+            self.filters = load_good_times(filename)
+            self.good_times_index = GoodTimesIndex(self.filters)
             return self.filters
         except FileNotFoundError:
             self.terminal.append(f"Error: Instruction file '{filename}' not found.")
             return None
 
     def check_filter_in_filepath(self, filepath):
-        return any(filter_entry[0] in filepath for filter_entry in self.filters) if self.filters is not None else True
+        return bool(self.good_times_index.orbits_in_path(filepath)) if self.filters is not None else True
 
     def check_channel_observation(self, filepath):
         if self.filters is None:
@@ -254,12 +590,11 @@ class SortingAlgorithm(QObject):
         is_lode = 'lode' in filepath
         is_hide = 'hide' in filepath
 
-        for filter_entry in self.filters:
-            if filter_entry[0] in filepath:
-                if (is_lode and 1 <= channel_number <= 8 and filter_entry[-8:][channel_number - 1] == '1') or \
-                        (is_hide and 1 <= channel_number <= 6 and filter_entry[-7:][channel_number - 1] == '1' and
-                         filter_entry[-1] == '2'):
-                    return True
+        for filter_entry in self.good_times_index.entries_for_path(filepath):
+            if (is_lode and 1 <= channel_number <= 8 and filter_entry["channels"][channel_number - 1] == 1) or \
+                    (is_hide and 1 <= channel_number <= 6 and filter_entry["channels"][channel_number - 1] == 1 and
+                     filter_entry["selection"] == 2):
+                return True
         return False
 
     def get_path(self, conditions):
@@ -269,7 +604,7 @@ class SortingAlgorithm(QObject):
         return ""
 
     def close_connection(self):
-        self.conn.close()
+        close_database_writers(self.database_writers)
 
     def stop_sorting_process(self):
         self.stop_flag = True
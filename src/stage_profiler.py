@@ -0,0 +1,81 @@
+import csv
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+STAGES = ["scan", "parse", "hex decode", "derive", "filter", "db write", "tensor save"]
+FIELDS = ["stage", "calls", "seconds", "bytes", "rows", "mb_per_second", "rows_per_second"]
+
+
+class StageProfiler:
+    """Accumulates wall time, bytes and rows per pipeline stage.
+
+    Stages timed in worker processes are merged with add(), so in parallel runs a stage's seconds
+    are summed over workers and can exceed the wall time of the run.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.started = time.perf_counter()
+
+    def add(self, name, seconds, bytes_processed=0, rows=0, calls=1):
+        with self.lock:
+            stats = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0, "bytes": 0, "rows": 0})
+            stats["calls"] += calls
+            stats["seconds"] += seconds
+            stats["bytes"] += int(bytes_processed)
+            stats["rows"] += int(rows)
+
+    @contextmanager
+    def stage(self, name, bytes_processed=0, rows=0):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, bytes_processed, rows)
+
+    def wall_time(self):
+        return time.perf_counter() - self.started
+
+    def records(self):
+        order = STAGES + sorted(name for name in self.stages if name not in STAGES)
+        records = []
+        for name in order:
+            stats = self.stages.get(name)
+            if stats is None:
+                continue
+            seconds = stats["seconds"]
+            records.append({
+                "stage": name,
+                "calls": stats["calls"],
+                "seconds": round(seconds, 6),
+                "bytes": stats["bytes"],
+                "rows": stats["rows"],
+                "mb_per_second": round(stats["bytes"] / seconds / 1e6, 3) if seconds > 0 else None,
+                "rows_per_second": round(stats["rows"] / seconds, 1) if seconds > 0 else None,
+            })
+        return records
+
+    def summary_lines(self):
+        lines = [f"Stage timings (wall time {self.wall_time():.2f} s):"]
+        for record in self.records():
+            line = f"  {record['stage']:<12} {record['seconds']:10.3f} s  {record['calls']:7d} calls"
+            if record["bytes"] and record["mb_per_second"] is not None:
+                line += f"  {record['mb_per_second']:9.2f} MB/s"
+            if record["rows"] and record["rows_per_second"] is not None:
+                line += f"  {record['rows_per_second']:12.0f} rows/s"
+            lines.append(line)
+        return lines
+
+    def export(self, path):
+        """Write the stage records as CSV when path ends in .csv, otherwise as JSON."""
+        if path.lower().endswith(".csv"):
+            with open(path, 'w', newline='') as file:
+                writer = csv.DictWriter(file, fieldnames=FIELDS)
+                writer.writeheader()
+                writer.writerows(self.records())
+        else:
+            with open(path, 'w') as file:
+                json.dump({"wall_seconds": round(self.wall_time(), 6), "stages": self.records()}, file, indent=2)
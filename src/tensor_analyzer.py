@@ -8,6 +8,10 @@ import seaborn as sns
 import gc
 
 from torch.utils.data import TensorDataset, DataLoader
+from tensor_shards import manifest_path_for, load_sharded_tensor, load_manifest, uses_shards
+from columnar_dataset import ColumnarDataset, is_columnar_dataset
+from interval_aggregation import IntervalAggregator, StreamingIntervalAggregator
+from good_times import load_good_times
 
 
 class PearsonsMatrixCreator:
@@ -23,10 +27,57 @@ class PearsonsMatrixCreator:
         self.channel_labels = [f'hi{i}' for i in range(1, 7)] + [f'lo{i}' for i in range(1, 9)]
         self.pearson_matrix = np.zeros((14, 14))
         self.terminal = terminal
+        self.chunk_size = None  # rows per chunk when streaming channel datasets; None loads each channel whole
+
+    def set_chunk_size(self, chunk_size):
+        chunk_size = int(chunk_size) if chunk_size else 0
+        if chunk_size < 0:
+            raise ValueError(f"chunk size must be 0 or more, got {chunk_size}")
+        self.chunk_size = chunk_size or None
 
     def load_tensor(self, path):
+        if uses_shards(path):
+            return load_sharded_tensor(manifest_path_for(path))
         return torch.load(path)
 
+    def load_met_and_counts(self, path):
+        columnar_path = os.path.splitext(path)[0]
+        if is_columnar_dataset(columnar_path):
+            dataset = ColumnarDataset(columnar_path)
+            return dataset.torch_column("MET"), dataset.torch_column("count")
+        return self.met_and_count_columns(self.load_tensor(path))
+
+    @staticmethod
+    def met_and_count_columns(tensor):
+        if isinstance(tensor, dict):
+            return tensor["MET"], tensor["count"]
+        # tensors created before the compact column layout are 2D float matrices
+        return tensor[:, 0], tensor[:, 5]
+
+    def iter_met_and_counts(self, path, chunk_size):
+        """Yield (MET, count) numpy chunks of at most chunk_size rows without loading the whole dataset."""
+        columnar_path = os.path.splitext(path)[0]
+        if is_columnar_dataset(columnar_path):
+            dataset = ColumnarDataset(columnar_path)
+            met_values, count_values = dataset.column("MET"), dataset.column("count")
+            for start in range(0, len(dataset), chunk_size):
+                yield np.array(met_values[start:start + chunk_size]), np.array(count_values[start:start + chunk_size])
+            return
+
+        if uses_shards(path):
+            manifest_path = manifest_path_for(path)
+            directory = os.path.dirname(manifest_path)
+            tensor_files = [os.path.join(directory, shard["file"]) for shard in load_manifest(manifest_path)["shards"]
+                            if shard["rows"]]
+        else:
+            tensor_files = [path]
+        for tensor_file in tensor_files:
+            # memory-mapped, so only the rows of the current chunk are read from disk
+            met_values, count_values = self.met_and_count_columns(torch.load(tensor_file, mmap=True))
+            for start in range(0, len(met_values), chunk_size):
+                yield (met_values[start:start + chunk_size].numpy().copy(),
+                       count_values[start:start + chunk_size].numpy().copy())
+
     def print_short_data_manual(self):
         self.terminal.append("File column description:")
         self.terminal.append("1) MET(s,GPS):   2) R.A.:   3) Decl:   4) ch:   5) ty:   6) count:   7) selnbits:   "
@@ -55,45 +106,31 @@ class PearsonsMatrixCreator:
     def translate_hex_to_int(self, hex_list):
         return [int(item, 16) for item in hex_list]
 
-    def managing_data_based_on_instruction_files(self, tensor, tensor_name, instruction_file, is_hi_channel):
-        if is_hi_channel:
-            channel_num = int(re.search(r'channel_(.+?).pt', tensor_name).group(1))
-            dtype = [('orbit', 'i4'), ('start_time', 'f8'), ('end_time', 'f8'), ('phase_start', 'i4'),
-                     ('phase_end', 'i4'), ('dataset', 'U2'), ('channel_1', 'i4'), ('channel_2', 'i4'),
-                     ('channel_3', 'i4'), ('channel_4', 'i4'), ('channel_5', 'i4'), ('channel_6', 'i4')]
-        else:
-            channel_num = int(
-                re.search(r'channel_(.+?).pt', tensor_name).group(1)) - 6
-            dtype = [('orbit', 'i4'), ('start_time', 'f8'), ('end_time', 'f8'), ('phase_start', 'i4'),
-                     ('phase_end', 'i4'), ('dataset', 'U2'), ('channel_1', 'i4'), ('channel_2', 'i4'),
-                     ('channel_3', 'i4'), ('channel_4', 'i4'), ('channel_5', 'i4'), ('channel_6', 'i4'),
-                     ('channel_7', 'i4'), ('channel_8', 'i4')]
-
-        instruction_data = np.genfromtxt(instruction_file, dtype=dtype, encoding=None)
-
-        time_start_col = 1
-        time_end_col = 2
-        phase_start_col = 3
-        phase_end_col = 4
-        channel_bool_checker_col = 5 + channel_num
-
-        good_data_intervals = []
-        for row in instruction_data:
-            if row[channel_bool_checker_col] == 1 and row[phase_start_col] == 0 and row[phase_end_col] == 59:
-                start_time = row[time_start_col]
-                end_time = row[time_end_col]
-                good_data_intervals.append({'start_time': start_time, 'end_time': end_time})
-
-        good_data_sums = []
-        for interval in good_data_intervals:
-            start_time = interval['start_time']
-            end_time = interval['end_time']
-            valid_data = tensor[(tensor[:, 0] >= start_time) & (tensor[:, 0] <= end_time)]
-            sum_valid_data = valid_data[:, 5].sum().item()
-            good_data_sums.append(sum_valid_data)
+    def good_data_intervals(self, tensor_name, instruction_file, is_hi_channel):
+        channel_num = int(re.search(r'channel_(.+?).pt', tensor_name).group(1))
+        if not is_hi_channel:
+            channel_num -= 6
+
+        instruction_data = load_good_times(instruction_file)
+        return instruction_data[(instruction_data['channels'][:, channel_num - 1] == 1)
+                                & (instruction_data['phase_start'] == 0)
+                                & (instruction_data['phase_end'] == 59)]
+
+    def managing_data_based_on_instruction_files(self, met_values, count_values, tensor_name, instruction_file,
+                                                 is_hi_channel):
+        good_data_intervals = self.good_data_intervals(tensor_name, instruction_file, is_hi_channel)
+        aggregator = IntervalAggregator(met_values, count_values)
+        good_data_sums = aggregator.sums(good_data_intervals['start_time'], good_data_intervals['end_time']).tolist()
         gc.collect()
         return good_data_sums
 
+    def streaming_interval_sums(self, path, tensor_name, instruction_file, is_hi_channel):
+        good_data_intervals = self.good_data_intervals(tensor_name, instruction_file, is_hi_channel)
+        aggregator = StreamingIntervalAggregator(good_data_intervals['start_time'], good_data_intervals['end_time'])
+        for met_values, count_values in self.iter_met_and_counts(path, self.chunk_size):
+            aggregator.add_chunk(met_values, count_values)
+        return aggregator.sums().astype(np.float64)
+
     def weighted_pearsons_coefficient(self, X_vals, Y_vals, weights):
         """Oblicza ważony współczynnik Pearsona."""
         if len(X_vals) == 0 or len(Y_vals) == 0:
@@ -114,49 +151,62 @@ class PearsonsMatrixCreator:
         gc.collect()
         return covariance / (std_x * std_y)
 
+    @staticmethod
+    def weighted_pearsons_matrix(vectors, weights):
+        """Weighted Pearson coefficients between all rows of a (channels, samples) matrix at once."""
+        vectors = np.asarray(vectors, dtype=np.float64)
+        weights = np.asarray(weights, dtype=np.float64)
+        if vectors.shape[1] == 0:
+            return np.full((len(vectors), len(vectors)), np.nan)
+        centered = vectors - (vectors @ weights / weights.sum())[:, None]
+        covariance = (centered * weights) @ centered.T
+        std = np.sqrt(np.diag(covariance))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            matrix = covariance / np.outer(std, std)
+        matrix[(std == 0)[:, None] | (std == 0)[None, :]] = np.nan
+        return matrix
+
+    def channel_paths(self, channel):
+        if channel <= 6:
+            return (os.path.join(self.hi_tensor_directory, f"{self.filename_prefix_hi}{channel}.pt"),
+                    self.hi_instruction_file, True)
+        return (os.path.join(self.lo_tensor_directory, f"{self.filename_prefix_lo}{channel - 6}.pt"),
+                self.lo_instruction_file, False)
+
+    def interval_counts_for_all_channels(self):
+        channel_counts = {}
+        for channel in range(1, 15):
+            tensor_path, instruction_file, is_hi_channel = self.channel_paths(channel)
+            try:
+                if self.chunk_size:
+                    channel_counts[channel] = self.streaming_interval_sums(
+                        tensor_path, f"channel_{channel}.pt", instruction_file, is_hi_channel)
+                    continue
+                met_values, count_values = self.load_met_and_counts(tensor_path)
+                channel_counts[channel] = np.asarray(self.managing_data_based_on_instruction_files(
+                    met_values, count_values, f"channel_{channel}.pt", instruction_file, is_hi_channel),
+                    dtype=np.float64)
+            except Exception as e:
+                print(f"Error loading interval counts for channel {channel}: {e}")
+        return channel_counts
+
     def calculate_pearsons_for_all_channels(self):
+        channel_counts = self.interval_counts_for_all_channels()
+        self.pearson_matrix = np.full((14, 14), np.nan)
+
+        # every pair is compared over its shorter count vector, so one matrix is computed per distinct length
+        for length in sorted({len(counts) for counts in channel_counts.values()}):
+            channels = [channel for channel, counts in channel_counts.items() if len(counts) >= length]
+            matrix = self.weighted_pearsons_matrix([channel_counts[channel][:length] for channel in channels],
+                                                   np.ones(length))
+            for a, i in enumerate(channels):
+                for b, j in enumerate(channels):
+                    if min(len(channel_counts[i]), len(channel_counts[j])) == length:
+                        self.pearson_matrix[i - 1, j - 1] = matrix[a, b]
+
         for i in range(1, 15):
             for j in range(1, 15):
-                if i <= 6:
-                    tensor_i_path = os.path.join(self.hi_tensor_directory, f"{self.filename_prefix_hi}{i}.pt")
-                    instruction_file_i = self.hi_instruction_file
-                    is_hi_channel_i = True
-                else:
-                    tensor_i_path = os.path.join(self.lo_tensor_directory, f"{self.filename_prefix_lo}{i - 6}.pt")
-                    instruction_file_i = self.lo_instruction_file
-                    is_hi_channel_i = False
-
-                if j <= 6:
-                    tensor_j_path = os.path.join(self.hi_tensor_directory, f"{self.filename_prefix_hi}{j}.pt")
-                    instruction_file_j = self.hi_instruction_file
-                    is_hi_channel_j = True
-                else:
-                    tensor_j_path = os.path.join(self.lo_tensor_directory, f"{self.filename_prefix_lo}{j - 6}.pt")
-                    instruction_file_j = self.lo_instruction_file
-                    is_hi_channel_j = False
-
-                try:
-                    tensor_i = self.load_tensor(tensor_i_path)
-                    tensor_j = self.load_tensor(tensor_j_path)
-
-                    counts_i = self.managing_data_based_on_instruction_files(tensor_i, f"channel_{i}.pt",
-                                                                             instruction_file_i, is_hi_channel_i)
-                    counts_j = self.managing_data_based_on_instruction_files(tensor_j, f"channel_{j}.pt",
-                                                                             instruction_file_j, is_hi_channel_j)
-
-                    min_length = min(len(counts_i), len(counts_j))
-                    counts_i = counts_i[:min_length]
-                    counts_j = counts_j[:min_length]
-
-                    weights = np.ones(min_length)
-
-                    pearson_value = self.weighted_pearsons_coefficient(counts_i, counts_j, weights)
-                    self.pearson_matrix[i - 1, j - 1] = pearson_value
-                    print(f"Weighted Pearson coefficient for channels {i} and {j}: {pearson_value}")
-
-                except Exception as e:
-                    print(f"Error calculating Pearson for channels {i} and {j}: {e}")
-                    self.pearson_matrix[i - 1, j - 1] = np.nan
+                print(f"Weighted Pearson coefficient for channels {i} and {j}: {self.pearson_matrix[i - 1, j - 1]}")
         gc.collect()
 
     def save_matrix_to_file(self, filename):
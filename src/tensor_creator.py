@@ -1,8 +1,113 @@
 import torch
 import numpy as np
+import hashlib
+import json
 import os
-import gc
-from PyQt5.QtCore import pyqtSignal, QObject
+import time
+import multiprocessing
+from qt_compat import pyqtSignal, QObject
+from ibex_reader import read_ibex_file, check_whole_numbers, TENSOR_DTYPE
+from tensor_shards import ShardWriter, records_to_tensors
+from columnar_dataset import ColumnarDatasetWriter, ColumnarDataset, is_columnar_dataset
+from column_buffer import ColumnBuffer
+from file_catalog import FileCatalog
+from stage_profiler import StageProfiler
+
+DERIVE_CHUNK_ROWS = 1 << 20  # rows copied at a time from a reused half-year output
+
+
+def column_dtypes():
+    return {column: TENSOR_DTYPE[column] for column in TENSOR_DTYPE.names}
+
+
+def compact_records(records, include_hex_flags):
+    """Copy parsed records into the compact TENSOR_DTYPE layout, zeroing ch/ty unless hex flags are kept.
+
+    Raises ValueError when a count is not a whole number or does not fit the unsigned 32-bit count column.
+    """
+    counts = records["count"]
+    check_whole_numbers(counts, "count")
+    limit = np.iinfo(TENSOR_DTYPE["count"]).max
+    out_of_range = (counts < 0) | (counts > limit)
+    if out_of_range.any():
+        raise ValueError(f"count {counts[out_of_range][0].item()!r} is outside the range 0..{limit}")
+    data_list = np.empty(len(records), dtype=TENSOR_DTYPE)
+    for column in TENSOR_DTYPE.names:
+        data_list[column] = records[column]
+    if not include_hex_flags:
+        data_list["ch"] = 0
+        data_list["ty"] = 0
+    return data_list
+
+
+def write_records(combined_data, save_path, columnar):
+    if columnar:
+        writer = ColumnarDatasetWriter(save_path, column_dtypes())
+        writer.append(combined_data)
+        writer.close()
+    else:
+        torch.save(records_to_tensors(combined_data), save_path)
+    return save_path
+
+
+def build_manifest_path(save_path):
+    """Sidecar recording the options a unit output was built with, next to its .pt path."""
+    return f"{os.path.splitext(save_path)[0]}.build.json"
+
+
+def unit_columns(output_path):
+    """Memory-mapped columns of a saved half-year or year output, columnar or per-column .pt."""
+    if is_columnar_dataset(output_path):
+        dataset = ColumnarDataset(output_path)
+        return {column: dataset.column(column) for column in TENSOR_DTYPE.names}
+    tensors = torch.load(output_path, mmap=True)
+    return {column: tensors[column].numpy() for column in TENSOR_DTYPE.names}
+
+
+def iter_column_chunks(columns, chunk_rows):
+    """Yield TENSOR_DTYPE records of at most chunk_rows rows; only the current chunk is read into memory."""
+    rows = len(columns["MET"])
+    for start in range(0, rows, chunk_rows):
+        records = np.empty(min(chunk_rows, rows - start), dtype=TENSOR_DTYPE)
+        for column, values in columns.items():
+            records[column] = values[start:start + len(records)]
+        yield records
+
+
+def load_unit_records(output_path):
+    """Read a saved half-year or year output back into one TENSOR_DTYPE array."""
+    columns = unit_columns(output_path)
+    records = np.empty(len(columns["MET"]), dtype=TENSOR_DTYPE)
+    for column, values in columns.items():
+        records[column] = values
+    return records
+
+
+def build_tensor_unit(task):
+    """Concatenate and save one half-year or year unit; runs in a worker process in parallel mode.
+
+    Sources are ("file", path) raw files to parse or ("output", path) half-year outputs to copy.
+    """
+    name, sources, save_path, include_hex_flags, columnar = task
+    timings = {"parse": 0.0, "hex decode": 0.0, "derive": 0.0, "tensor save": 0.0}
+    buffer = ColumnBuffer(TENSOR_DTYPE)
+    for kind, path in sources:
+        if kind == "output":
+            derive_start = time.perf_counter()
+            buffer.append(load_unit_records(path))
+            timings["derive"] += time.perf_counter() - derive_start
+            continue
+        records = read_ibex_file(path, timings)
+        convert_start = time.perf_counter()
+        buffer.append(compact_records(records, include_hex_flags))
+        timings["hex decode"] += time.perf_counter() - convert_start
+    if not sources:
+        return name, None, 0, 0, timings
+    combined_data = buffer.view()
+    save_start = time.perf_counter()
+    write_records(combined_data, save_path, columnar)
+    timings["tensor save"] = time.perf_counter() - save_start
+    return name, save_path, len(combined_data), combined_data.nbytes, timings
 
 
 class TensorCreator(QObject):
@@ -27,6 +132,13 @@ class TensorCreator(QObject):
         self.total_dirs = 0
         self.scanned_files = 0
         self.total_files = 0
+        self.output_format = "PyTorch tensors (.pt)"
+        self.shard_writers = {}
+        self.column_writers = {}
+        self.catalog = None
+        self.profiler = StageProfiler()
+        self.profile_path = None
+        self.workers = 1
 
     def set_path(self, path):
         self.path = path
@@ -46,6 +158,15 @@ class TensorCreator(QObject):
     def set_channel_division(self, channel_division):
         self.channel_division = channel_division
 
+    def set_output_format(self, output_format):
+        self.output_format = output_format
+
+    def set_profile_path(self, profile_path):
+        self.profile_path = profile_path
+
+    def set_workers(self, workers):
+        self.workers = max(1, int(workers))
+
     def set_timespan_attribute(self, timespan_attribute):
         if timespan_attribute == "Every half year":
             self.structure_attribute = 0
@@ -64,24 +185,221 @@ class TensorCreator(QObject):
 
     def create_data_tensor(self):
         self.terminal.append("Initialising tensor creation with raw data...")
-        if self.structure_attribute == 0:
-            self.init_half_year_tensors()
-        elif self.structure_attribute == 1:
-            self.init_year_tensors()
-        elif self.structure_attribute == 2:
-            self.init_alldata_tensors()
-        elif self.structure_attribute == 3:
-            self.init_channel_tensors()
-        else:
-            self.terminal.append("Invalid tensor creation option selected!")
-            return
+        self.profiler = StageProfiler()
+        with self.profiler.stage("scan"):
+            self.catalog = FileCatalog(self.path).scan()
+        try:
+            if self.structure_attribute == 0:
+                self.init_half_year_tensors()
+            elif self.structure_attribute == 1:
+                self.init_year_tensors()
+            elif self.structure_attribute == 2:
+                self.init_alldata_tensors()
+            elif self.structure_attribute == 3:
+                self.init_channel_tensors()
+            else:
+                self.terminal.append("Invalid tensor creation option selected!")
+                return
+        finally:
+            with self.profiler.stage("tensor save"):
+                self.finish_batches()
+            self.report_profile()
+
+    def report_profile(self):
+        for line in self.profiler.summary_lines():
+            self.terminal.append(line)
+        if self.profile_path:
+            try:
+                self.profiler.export(self.profile_path)
+                self.terminal.append(f"Stage timings saved to {self.profile_path}")
+            except OSError as e:
+                self.terminal.append(f"Could not save stage timings: {e}")
+
+    def load_file(self, file_path):
+        timings = {}
+        records = read_ibex_file(file_path, timings)
+        convert_start = time.perf_counter()
+        records = self.remove_or_convert_hex_flags(records)
+        timings["hex decode"] += time.perf_counter() - convert_start
+        self.profiler.add("parse", timings["parse"], self.catalog.file_size(file_path), len(records))
+        self.profiler.add("hex decode", timings["hex decode"], rows=len(records))
+        return records
+
+    def directory_files(self, root, files):
+        """Files of the selected type in root, provided it holds a quaternion file."""
+        if self.catalog.has_quaternion(root, self.quaternion_file):
+            return [os.path.join(root, file) for file in files if self.file_type in file]
+        return []
+
+    def unit_files(self, subdir_paths):
+        """Files of the selected type in quaternion directories, in the order the serial build reads them."""
+        file_paths = []
+        for subdir_path in subdir_paths:
+            if self.catalog.entry(subdir_path) is None:
+                continue
+            for root, _, files in self.catalog.walk(subdir_path):
+                file_paths.extend(self.directory_files(root, files))
+        return file_paths
+
+    def build_options(self, subdir_paths):
+        """Options and source-file fingerprint that together determine a unit's output."""
+        # stat the files themselves: the catalog only notices edits that change a directory's mtime
+        digest = hashlib.sha1()
+        for file_path in self.unit_files(subdir_paths):
+            stat = os.stat(file_path)
+            digest.update(f"{self.catalog.relative(file_path)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8"))
+        return {
+            "file_type": self.file_type,
+            "quaternion_file": self.quaternion_file,
+            "include_hex_flags": self.include_hex_flags,
+            "dtype": str(TENSOR_DTYPE.descr),
+            "sources": digest.hexdigest(),
+        }
+
+    def discard_build_manifest(self, save_path):
+        try:
+            os.remove(build_manifest_path(save_path))
+        except FileNotFoundError:
+            pass
+
+    def write_build_manifest(self, save_path, output_path, options):
+        """Record options, taken from build_options() before the build read any file, next to save_path."""
+        manifest = {
+            "format": "ibex-tensor-build",
+            "version": 1,
+            "output": os.path.basename(output_path),
+            "options": options,
+        }
+        manifest_path = build_manifest_path(save_path)
+        try:
+            with open(f"{manifest_path}.tmp", 'w') as file:
+                json.dump(manifest, file, indent=2)
+            os.replace(f"{manifest_path}.tmp", manifest_path)
+        except OSError as e:
+            self.terminal.append(f"Could not save build manifest {manifest_path}: {e}")
+
+    def reusable_half_year_output(self, half_year_dir):
+        """Existing output for half_year_dir built from the same files with the current options, or None."""
+        save_path = f"{self.savefile_prefix}_half_year_{half_year_dir}.pt"
+        try:
+            with open(build_manifest_path(save_path), 'r') as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("options") != self.build_options([os.path.join(self.path, half_year_dir)]):
+            return None
+        output_path = os.path.join(os.path.dirname(save_path), manifest.get("output", ""))
+        if not (os.path.isfile(output_path) or is_columnar_dataset(output_path)):
+            return None
+        return output_path
+
+    def derived_half_year_chunks(self, half_year_dir, chunk_rows):
+        """Chunks of a reusable half-year output, read lazily, or None when the half year has to be parsed."""
+        output_path = self.reusable_half_year_output(half_year_dir)
+        if output_path is None:
+            return None
+        try:
+            columns = unit_columns(output_path)
+        except (OSError, RuntimeError, KeyError, ValueError) as e:
+            self.terminal.append(f"Could not reuse {output_path}, parsing raw files instead: {e}")
+            return None
+        self.update_second_label.emit(f"Reusing half year output: {output_path}")
+        self.terminal.append(f"Reusing half year output {output_path}")
+        return self.iter_derived_chunks(columns, chunk_rows)
+
+    def iter_derived_chunks(self, columns, chunk_rows):
+        rows = len(columns["MET"])
+        copied_rows = 0
+        chunks = iter_column_chunks(columns, chunk_rows)
+        while not self.stop_tensor:
+            derive_start = time.perf_counter()
+            records = next(chunks, None)
+            if records is None:
+                return
+            self.profiler.add("derive", time.perf_counter() - derive_start, records.nbytes, len(records))
+            yield records
+            copied_rows += len(records)
+            self.update_second_progress.emit(int((copied_rows / rows) * 100))
+
+    def save_unit(self, combined_data, save_path, options):
+        """Save a half-year or year unit and record the options it was built with."""
+        self.discard_build_manifest(save_path)
+        output_path = self.save_tensor(combined_data, save_path)
+        self.write_build_manifest(save_path, output_path, options)
+        return output_path
+
+    def unit_sources(self, subdir_paths, derive_half_years):
+        sources = []
+        for subdir_path in subdir_paths:
+            if derive_half_years and self.catalog.entry(subdir_path) is not None:
+                output_path = self.reusable_half_year_output(os.path.basename(subdir_path))
+                if output_path is not None:
+                    sources.append(("output", output_path))
+                    self.terminal.append(f"Reusing half year output {output_path}")
+                    continue
+            sources.extend(("file", file_path) for file_path in self.unit_files([subdir_path]))
+        return sources
+
+    def build_units_in_pool(self, units, derive_half_years=False):
+        """Build (name, subdir_paths, save_path) units in worker processes, at most self.workers at a time."""
+        self.total_dirs = len(units)
+        self.scanned_dirs = 0
+        self.update_progress.emit(0)
+        self.update_second_progress.emit(0)
+        self.update_label.emit(f"Building {len(units)} tensors with {self.workers} worker processes...")
+        columnar = self.uses_columnar_output()
+        tasks = []
+        file_sizes = {}
+        unit_options = {}
+        for name, subdir_paths, save_path in units:
+            # fingerprint the inputs before any worker reads them, so a file edited mid-build is rebuilt next time
+            unit_options[name] = (self.build_options(subdir_paths), save_path)
+            sources = self.unit_sources(subdir_paths, derive_half_years)
+            file_sizes[name] = sum(self.catalog.file_size(path) for kind, path in sources if kind == "file")
+            self.discard_build_manifest(save_path)
+            if columnar:
+                save_path = self.columnar_path(save_path)
+            tasks.append((name, sources, save_path, self.include_hex_flags, columnar))
+
+        # spawn keeps the workers independent of the Qt threads; one unit per child bounds the memory in flight
+        context = multiprocessing.get_context("spawn")
+        pool = context.Pool(processes=min(self.workers, max(len(tasks), 1)), maxtasksperchild=1)
+        try:
+            for name, output_path, rows, nbytes, timings in pool.imap_unordered(build_tensor_unit, tasks):
+                if self.stop_tensor:
+                    self.update_label.emit("Data processing stopped!")
+                    return
+                if timings["parse"]:
+                    self.profiler.add("parse", timings["parse"], file_sizes[name], rows)
+                    self.profiler.add("hex decode", timings["hex decode"], rows=rows)
+                if timings["derive"]:
+                    self.profiler.add("derive", timings["derive"])
+                self.profiler.add("tensor save", timings["tensor save"], nbytes, rows)
+                if output_path is not None:
+                    options, save_path = unit_options[name]
+                    self.write_build_manifest(save_path, output_path, options)
+                    self.terminal.append(f"Saved tensor for {name} to {output_path}")
+                self.scanned_dirs += 1
+                self.update_progress.emit(int((self.scanned_dirs / self.total_dirs) * 100))
+        finally:
+            # every result has been received unless the run was stopped or a worker failed
+            pool.terminate()
+            pool.join()
+        self.update_second_progress.emit(100)
+        self.update_label.emit("Data processing finished!")
 
     def init_half_year_tensors(self):
-        half_year_dirs = [d for d in os.listdir(self.path) if os.path.isdir(os.path.join(self.path, d))]
+        half_year_dirs = self.catalog.subdirectories()
+        if self.workers > 1:
+            self.build_units_in_pool([(half_year_dir, [os.path.join(self.path, half_year_dir)],
+                                       f"{self.savefile_prefix}_half_year_{half_year_dir}.pt")
+                                      for half_year_dir in half_year_dirs])
+            return
         self.total_dirs = len(half_year_dirs)
         self.scanned_dirs = 0
         self.update_second_progress.emit(0)
         self.update_progress.emit(0)
+        buffer = ColumnBuffer(TENSOR_DTYPE)
         for half_year_dir in half_year_dirs:
             if self.stop_tensor:
                 proglabel = "Data processing stopped!"
@@ -90,46 +408,49 @@ class TensorCreator(QObject):
             subdir_path = os.path.join(self.path, half_year_dir)
             proglabel = f"Processing half year directory: {subdir_path}"
             self.update_label.emit(proglabel)
-            data_list = []
+            buffer.clear()
+            loaded_files = 0
+            options = self.build_options([subdir_path])
             self.scanned_dirs += 1
             self.update_progress.emit(int((self.scanned_dirs / self.total_dirs) * 100))
-            gc.collect()
-            for root, _, files in os.walk(subdir_path):
+            for root, _, files in self.catalog.walk(subdir_path):
                 self.total_files = len(files)
                 self.scanned_files = 0
                 if self.stop_tensor:
                     proglabel = "Data processing stopped!"
                     self.update_label.emit(proglabel)
                     return
-                if any(file.endswith(self.quaternion_file) for file in files):
+                if self.catalog.has_quaternion(root, self.quaternion_file):
                     for file in files:
                         if self.file_type in file:
                             file_path = os.path.join(root, file)
                             proglabel2 = f"Loading file: {file_path}"
                             self.update_second_label.emit(proglabel2)
-                            text = np.loadtxt(file_path, dtype='str')
-                            text = self.remove_or_convert_hex_flags(text)
-                            text = np.array(text, dtype=float)
-                            data_list.append(text)
+                            buffer.append(self.load_file(file_path))
+                            loaded_files += 1
                         self.scanned_files += 1
                         self.update_second_progress.emit(int((self.scanned_files / self.total_files) * 100))
-                        gc.collect()
-            if data_list:
-                combined_data = np.vstack(data_list)
-                save_path = f"{self.savefile_prefix}_half_year_{half_year_dir}.pt"
-                torch.save(torch.tensor(combined_data), save_path)
+            if loaded_files:
+                save_path = self.save_unit(buffer.view(), f"{self.savefile_prefix}_half_year_{half_year_dir}.pt",
+                                           options)
                 self.terminal.append(f"Saved tensor for {half_year_dir} to {save_path}")
         proglabel = "Data processing finished!"
         self.update_label.emit(proglabel)
-        gc.collect()
 
     def init_year_tensors(self):
         # Identify all unique years
-        year_dirs = sorted({d[:4] for d in os.listdir(self.path) if os.path.isdir(os.path.join(self.path, d))})
+        year_dirs = sorted({d[:4] for d in self.catalog.subdirectories()})
+        if self.workers > 1:
+            self.build_units_in_pool([(f"year {year_dir}",
+                                       [os.path.join(self.path, f"{year_dir}{half}") for half in ['A', 'B']],
+                                       f"{self.savefile_prefix}_year_{year_dir}.pt")
+                                      for year_dir in year_dirs], derive_half_years=True)
+            return
         self.total_dirs = len(year_dirs)
         self.scanned_dirs = 0
         self.update_second_progress.emit(0)
         self.update_progress.emit(0)
+        buffer = ColumnBuffer(TENSOR_DTYPE)
 
         for year_dir in year_dirs:
             if self.stop_tensor:
@@ -140,7 +461,9 @@ class TensorCreator(QObject):
             proglabel = f"Processing year directory: {year_dir}"
             self.update_label.emit(proglabel)
 
-            data_list = []
+            buffer.clear()
+            loaded_files = 0
+            options = self.build_options([os.path.join(self.path, f"{year_dir}{half}") for half in ['A', 'B']])
             self.scanned_dirs += 1
             self.update_progress.emit(int((self.scanned_dirs / self.total_dirs) * 100))
 
@@ -148,8 +471,15 @@ class TensorCreator(QObject):
                 half_year_dir = f"{year_dir}{half}"
                 subdir_path = os.path.join(self.path, half_year_dir)
 
-                if os.path.isdir(subdir_path):
-                    for root, _, files in os.walk(subdir_path):
+                if self.catalog.entry(subdir_path) is not None:
+                    chunks = self.derived_half_year_chunks(half_year_dir, DERIVE_CHUNK_ROWS)
+                    if chunks is not None:
+                        for records in chunks:
+                            buffer.append(records)
+                        loaded_files += 1
+                        continue
+
+                    for root, _, files in self.catalog.walk(subdir_path):
                         self.total_files = len(files)
                         self.scanned_files = 0
 
@@ -158,50 +488,52 @@ class TensorCreator(QObject):
                             self.update_label.emit(proglabel)
                             return
 
-                        if any(file.endswith(self.quaternion_file) for file in files):
+                        if self.catalog.has_quaternion(root, self.quaternion_file):
                             for file in files:
                                 if self.file_type in file:
                                     file_path = os.path.join(root, file)
                                     proglabel2 = f"Loading file: {file_path}"
                                     self.update_second_label.emit(proglabel2)
 
-                                    text = np.loadtxt(file_path, dtype='str')
-                                    text = self.remove_or_convert_hex_flags(text)
-                                    text = np.array(text, dtype=float)
-                                    data_list.append(text)
+                                    buffer.append(self.load_file(file_path))
+                                    loaded_files += 1
 
                                 self.scanned_files += 1
                                 self.update_second_progress.emit(int((self.scanned_files / self.total_files) * 100))
 
-                            gc.collect()
+            if self.stop_tensor:
+                # a half year reused in chunks may have been cut short; never save a partial year
+                proglabel = "Data processing stopped!"
+                self.update_label.emit(proglabel)
+                return
 
-            if data_list:
-                combined_data = np.vstack(data_list)
-                save_path = f"{self.savefile_prefix}_year_{year_dir}.pt"
-                torch.save(torch.tensor(combined_data), save_path)
+            if loaded_files:
+                save_path = self.save_unit(buffer.view(), f"{self.savefile_prefix}_year_{year_dir}.pt", options)
                 self.terminal.append(f"Saved tensor for year {year_dir} to {save_path}")
-                print(f"Shape of combined data for year {year_dir}: {combined_data.shape}")
+                print(f"Shape of combined data for year {year_dir}: {buffer.view().shape}")
 
         proglabel = "Data processing finished!"
         self.update_label.emit(proglabel)
-        gc.collect()
 
     def init_alldata_tensors(self):
         proglabel = "Processing all data..."
         self.update_label.emit(proglabel)
 
         batch_size_limit = 2 * 1024 ** 3  # 2 GB limit per batch
-        batch_data_list = []
-        batch_current_size = 0
+        buffer = ColumnBuffer(TENSOR_DTYPE, max_rows=batch_size_limit // TENSOR_DTYPE.itemsize)
         first_batch = True
         save_path = f"{self.savefile_prefix}_all_data.pt"
 
-        self.total_dirs = sum(len(dirs) for _, dirs, _ in os.walk(self.path))
+        # a full walk reads the root's own files first, then each half-year directory in turn
+        root_entry = self.catalog.entry(self.path)
+        root_files = self.directory_files(self.path, list(root_entry["files"])) if root_entry else []
+        half_year_dirs = self.catalog.subdirectories()
+        self.total_dirs = len(half_year_dirs) + 1
         self.scanned_dirs = 0
         self.update_second_progress.emit(0)
         self.update_progress.emit(0)
 
-        for root, dirs, files in os.walk(self.path):
+        for half_year_dir in [None] + half_year_dirs:
             if self.stop_tensor:
                 proglabel = "Data processing stopped!"
                 self.update_label.emit(proglabel)
@@ -209,143 +541,157 @@ class TensorCreator(QObject):
 
             self.scanned_dirs += 1
             self.update_progress.emit(int((self.scanned_dirs / self.total_dirs) * 100))
-            self.scanned_files = 0
-            self.total_files = len(files)
 
-            if any(file.endswith(self.quaternion_file) for file in files):
-                for file in files:
-                    if self.file_type in file:
-                        file_path = os.path.join(root, file)
-                        proglabel2 = f"Loading file: {file_path}"
-                        self.update_second_label.emit(proglabel2)
-
-                        text = np.loadtxt(file_path, dtype='str')
-                        text = self.remove_or_convert_hex_flags(text)
-                        text = np.array(text, dtype=float)
-
-                        batch_data_list.append(text)
-                        batch_current_size += text.nbytes
+            if half_year_dir is None:
+                unit_records = self.iter_file_records([(self.path, root_files)])
+            else:
+                subdir_path = os.path.join(self.path, half_year_dir)
+                unit_records = self.derived_half_year_chunks(half_year_dir, DERIVE_CHUNK_ROWS)
+                if unit_records is None:
+                    unit_records = self.iter_file_records(
+                        (root, self.directory_files(root, files)) for root, _, files in self.catalog.walk(subdir_path))
 
-                        if batch_current_size >= batch_size_limit:
-                            self.save_batch(batch_data_list, save_path, first_batch)
-                            first_batch = False
-                            batch_data_list = []
-                            batch_current_size = 0
+            for records in unit_records:
+                buffer.append(records)
 
-                        self.scanned_files += 1
-                        self.update_second_progress.emit(int((self.scanned_files / self.total_files) * 100))
-                        gc.collect()
+                if buffer.nbytes >= batch_size_limit:
+                    self.save_batch(buffer.view(), save_path, first_batch)
+                    first_batch = False
+                    buffer.clear()
 
-        if batch_data_list:
-            self.save_batch(batch_data_list, save_path, first_batch)
+        if len(buffer):
+            self.save_batch(buffer.view(), save_path, first_batch)
 
         proglabel = "Data processing finished!"
         self.update_label.emit(proglabel)
-        gc.collect()
+
+    def iter_file_records(self, directories):
+        """Load the files of (root, file_paths) directories one at a time, stopping between directories."""
+        for root, file_paths in directories:
+            if self.stop_tensor:
+                return
+            self.scanned_files = 0
+            self.total_files = len(file_paths)
+            for file_path in file_paths:
+                proglabel2 = f"Loading file: {file_path}"
+                self.update_second_label.emit(proglabel2)
+                yield self.load_file(file_path)
+                self.scanned_files += 1
+                self.update_second_progress.emit(int((self.scanned_files / self.total_files) * 100))
 
     def init_channel_tensors(self):
-        if self.instruction == "HiCullGoodTimes.txt":
+        if os.path.basename(self.instruction) == "HiCullGoodTimes.txt":
             channel_num = 6
             self.channel_tensor_creation(channel_num)
-        elif self.instruction == "LoGoodTimes.txt":
+        elif os.path.basename(self.instruction) == "LoGoodTimes.txt":
             channel_num = 8
             self.channel_tensor_creation(channel_num)
         else:
-            self.terminal.appen("Incorrect instruction file. Aborting...")
+            self.terminal.append("Incorrect instruction file. Aborting...")
             pass
 
     def channel_tensor_creation(self, channel_num):
-        for i in range(1, channel_num+1):
-            channel_file_regex = self.file_type + '-' + f"{i}"
-            proglabel = f"Processing files {channel_file_regex}"
-            self.update_label.emit(proglabel)
+        channel_file_regexes = {i: self.file_type + '-' + f"{i}" for i in range(1, channel_num + 1)}
+        proglabel = f"Processing files {self.file_type}-1 to {self.file_type}-{channel_num}"
+        self.update_label.emit(proglabel)
 
-            batch_size_limit = 2 * 1024 ** 3  # 2 GB limit per batch
-            batch_data_list = []
-            batch_current_size = 0
-            first_batch = True
-            save_path = f"{self.savefile_prefix}_{i}.pt"
+        # all channels are buffered at once, so they share the batch budget of a single output
+        batch_size_limit = 2 * 1024 ** 3 // channel_num
+        buffers = {i: ColumnBuffer(TENSOR_DTYPE, max_rows=batch_size_limit // TENSOR_DTYPE.itemsize)
+                   for i in channel_file_regexes}
+        first_batches = {i: True for i in channel_file_regexes}
+        save_paths = {i: f"{self.savefile_prefix}_{i}.pt" for i in channel_file_regexes}
 
-            self.total_dirs = sum(len(dirs) for _, dirs, _ in os.walk(self.path))
-            self.scanned_dirs = 0
-            self.update_second_progress.emit(0)
-            self.update_progress.emit(0)
+        self.total_dirs = self.catalog.count_dirs()
+        self.scanned_dirs = 0
+        self.update_second_progress.emit(0)
+        self.update_progress.emit(0)
 
-            for root, dirs, files in os.walk(self.path):
-                if self.stop_tensor:
-                    proglabel = "Data processing stopped!"
-                    self.update_label.emit(proglabel)
-                    return
+        for root, dirs, files in self.catalog.walk():
+            if self.stop_tensor:
+                proglabel = "Data processing stopped!"
+                self.update_label.emit(proglabel)
+                return
 
-                self.scanned_dirs += 1
-                self.update_progress.emit(int((self.scanned_dirs / self.total_dirs) * 100))
-                self.scanned_files = 0
-                self.total_files = len(files)
+            self.scanned_dirs += 1
+            self.update_progress.emit(int((self.scanned_dirs / self.total_dirs) * 100))
+            self.scanned_files = 0
+            self.total_files = len(files)
 
-                if any(file.endswith(self.quaternion_file) for file in files):
-                    for file in files:
+            if self.catalog.has_quaternion(root, self.quaternion_file):
+                for file in files:
+                    channels = [i for i, channel_file_regex in channel_file_regexes.items() if channel_file_regex in file]
+                    if not channels:
+                        continue
+                    file_path = os.path.join(root, file)
+                    proglabel2 = f"Loading file: {file_path}"
+                    self.update_second_label.emit(proglabel2)
 
-                        if channel_file_regex in file:
-                            file_path = os.path.join(root, file)
-                            proglabel2 = f"Loading file: {file_path}"
-                            self.update_second_label.emit(proglabel2)
+                    text = self.load_file(file_path)
 
-                            text = np.loadtxt(file_path, dtype='str')
-                            text = self.remove_or_convert_hex_flags(text)
-                            text = np.array(text, dtype=float)
+                    for i in channels:
+                        buffers[i].append(text)
 
-                            batch_data_list.append(text)
-                            batch_current_size += text.nbytes
+                        if buffers[i].nbytes >= batch_size_limit:
+                            self.save_batch(buffers[i].view(), save_paths[i], first_batches[i])
+                            first_batches[i] = False
+                            buffers[i].clear()
 
-                            if batch_current_size >= batch_size_limit:
-                                self.save_batch(batch_data_list, save_path, first_batch)
-                                first_batch = False
-                                batch_data_list = []
-                                batch_current_size = 0
+                    self.scanned_files += 1
+                    self.update_second_progress.emit(int((self.scanned_files / self.total_files) * 100))
 
-                            self.scanned_files += 1
-                            self.update_second_progress.emit(int((self.scanned_files / self.total_files) * 100))
-                            gc.collect()
+        for i, buffer in buffers.items():
+            if len(buffer):
+                self.save_batch(buffer.view(), save_paths[i], first_batches[i])
 
-            if batch_data_list:
-                self.save_batch(batch_data_list, save_path, first_batch)
+        proglabel = "Data processing finished!"
+        self.update_label.emit(proglabel)
 
-            proglabel = "Data processing finished!"
-            self.update_label.emit(proglabel)
-            gc.collect()
+    def uses_columnar_output(self):
+        return self.output_format == "Memory-mapped columns"
+
+    @staticmethod
+    def columnar_path(save_path):
+        return os.path.splitext(save_path)[0]
+
+    def save_tensor(self, combined_data, save_path):
+        """Save one complete dataset in the selected output format and return where it was written."""
+        with self.profiler.stage("tensor save", combined_data.nbytes, len(combined_data)):
+            return self.write_tensor(combined_data, save_path)
+
+    def write_tensor(self, combined_data, save_path):
+        if self.uses_columnar_output():
+            save_path = self.columnar_path(save_path)
+        return write_records(combined_data, save_path, self.uses_columnar_output())
+
+    def save_batch(self, combined_data, save_path, first_batch):
+        """Append the batch to save_path's output, starting a fresh output on the first batch."""
+        with self.profiler.stage("tensor save", combined_data.nbytes, len(combined_data)):
+            self.write_batch(combined_data, save_path, first_batch)
+
+    def write_batch(self, combined_data, save_path, first_batch):
+        if self.uses_columnar_output():
+            if first_batch or save_path not in self.column_writers:
+                self.column_writers[save_path] = ColumnarDatasetWriter(self.columnar_path(save_path),
+                                                                       column_dtypes())
+            self.column_writers[save_path].append(combined_data)
+            self.terminal.append(f"Appended batch to {self.columnar_path(save_path)}")
+            return
 
-    def save_batch(self, batch_data_list, save_path, first_batch):
-        """Save the batch of data to a file, appending if not the first batch."""
-        combined_data = np.vstack(batch_data_list)
-        tensor_data = torch.tensor(combined_data, dtype=torch.float)
+        tensor_data = records_to_tensors(combined_data)
+        if first_batch or save_path not in self.shard_writers:
+            self.shard_writers[save_path] = ShardWriter(save_path)
+        shard_path = self.shard_writers[save_path].append(tensor_data)
+        self.terminal.append(f"Saved batch to {shard_path} (manifest: {self.shard_writers[save_path].manifest_path})")
 
-        if first_batch:
-            torch.save(tensor_data, save_path)
-            self.terminal.append(f"Saved initial batch to {save_path}")
-        else:
-            existing_data = torch.load(save_path)
-            updated_data = torch.cat((existing_data, tensor_data), dim=0)
-            torch.save(updated_data, save_path)
-            self.terminal.append(f"Appended batch to {save_path}")
-
-        gc.collect()
-
-    def remove_or_convert_hex_flags(self, data_list):
-        if self.include_hex_flags:
-            ch_column = data_list[:, 3]
-            ty_column = data_list[:, 4]
-            int_ch_column = np.vectorize(lambda x: int(x, 16))(ch_column)
-            int_ty_column = np.vectorize(lambda x: int(x, 16))(ty_column)
-            data_list[:, 3] = int_ch_column  # changing ch from hex to int
-            data_list[:, 4] = int_ty_column  # changing ty from hex to int
-            data_list[:,
-            6] = '0'  # selnbits are not used so ve just ignore them (i dont know what they are and i dont care tbh)
-        else:
-            data_list[:, 3] = '0'
-            data_list[:, 4] = '0'
-            data_list[:, 6] = '0'  # still ignoring them fuckers
-        gc.collect()
-        return data_list
+    def finish_batches(self):
+        for writer in self.column_writers.values():
+            writer.close()
+        self.column_writers.clear()
+        self.shard_writers.clear()
+
+    def remove_or_convert_hex_flags(self, records):
+        return compact_records(records, self.include_hex_flags)
 
     def stop_tensor_creation_process(self):
         self.stop_tensor = True
@@ -3,6 +3,7 @@ from PyQt5.QtCore import QSize, Qt, pyqtSignal
 from PyQt5.QtWidgets import (
     QLabel, QPushButton, QComboBox, QVBoxLayout, QHBoxLayout, QMainWindow, QFrame
 )
+from selection_menu import WORKER_COUNTS
 
 
 class TensorSelectionFrame(QMainWindow):
@@ -17,7 +18,9 @@ class TensorSelectionFrame(QMainWindow):
         self.structure_attribute = ["By channels", "Every half year", "Every year", "All at once"]
         self.remove_hex_flags = ["Translate to int", "Replace with '0'"]
         self.divide_by_channels = ["On", "Off"]
-        self.setFixedSize(QSize(300, 380))
+        self.output_formats = ["PyTorch tensors (.pt)", "Memory-mapped columns"]
+        self.worker_counts = WORKER_COUNTS
+        self.setFixedSize(QSize(300, 480))
         self.setWindowTitle("Select tensor options:")
         self.init_sub_ui()
         self.load_qt_stylesheet(self.stylesheet)
@@ -49,6 +52,9 @@ class TensorSelectionFrame(QMainWindow):
         self.hex_combobox = self.add_combobox(selection_layout, "Hex flags", self.remove_hex_flags)
 
         self.switch_channel_division = self.add_combobox(selection_layout, "Divide data by channels", self.divide_by_channels)
+        self.output_format_combobox = self.add_combobox(selection_layout, "Output format", self.output_formats)
+        self.workers_combobox = self.add_combobox(selection_layout, "Worker processes (half year/year)",
+                                                  self.worker_counts)
 
         bottom_layout = QHBoxLayout()
         confirm = QPushButton("Confirm")
@@ -91,6 +97,8 @@ class TensorSelectionFrame(QMainWindow):
         timespan = self.timespan_combobox.currentText()
         hex = self.hex_combobox.currentText()
         channel_division = self.switch_channel_division.currentText()
+        output_format = self.output_format_combobox.currentText()
+        workers = int(self.workers_combobox.currentText())
         options = {
             'instruction': instruction,
             'quaternion': quaternion,
@@ -98,6 +106,8 @@ class TensorSelectionFrame(QMainWindow):
             'timespan': timespan,
             'divide_by_channels': channel_division,
             'hex': hex,
+            'output_format': output_format,
+            'workers': workers,
         }
         self.tensor_options_selected.emit(options)
         self.close()
@@ -0,0 +1,127 @@
+import json
+import os
+import torch
+
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+def manifest_path_for(save_path):
+    return f"{os.path.splitext(save_path)[0]}{MANIFEST_SUFFIX}"
+
+
+def uses_shards(save_path):
+    """Whether save_path's dataset should be read from its shard manifest rather than the single-file .pt.
+
+    The newer of the two wins when both exist, so a single file left behind by an earlier run never
+    hides a later sharded output.
+    """
+    manifest_path = manifest_path_for(save_path)
+    if not os.path.exists(manifest_path):
+        return False
+    if not os.path.exists(save_path):
+        return True
+    return os.path.getmtime(manifest_path) >= os.path.getmtime(save_path)
+
+
+def records_to_tensors(records):
+    """Turn a structured array into a dict of per-column tensors that keep each field's dtype."""
+    # copy() rather than ascontiguousarray(): a one-row field view counts as contiguous but keeps the record stride
+    return {name: torch.from_numpy(records[name].copy()) for name in records.dtype.names}
+
+
+def tensor_rows(tensor_data):
+    if isinstance(tensor_data, dict):
+        return len(tensor_data["MET"])
+    return int(tensor_data.shape[0])
+
+
+def met_column(tensor_data):
+    return tensor_data["MET"] if isinstance(tensor_data, dict) else tensor_data[:, 0]
+
+
+class ShardWriter:
+    """Append-only writer of numbered tensor shards described by a small JSON manifest.
+
+    Starting a writer removes the previous shards and any single-file tensor saved under the same name.
+    """
+
+    def __init__(self, save_path):
+        self.base_path = os.path.splitext(save_path)[0]
+        self.manifest_path = manifest_path_for(save_path)
+        self.shards = []
+        self.remove_previous_shards()
+        if os.path.exists(save_path):
+            os.remove(save_path)
+
+    def remove_previous_shards(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        directory = os.path.dirname(self.manifest_path)
+        for shard in load_manifest(self.manifest_path)["shards"]:
+            shard_path = os.path.join(directory, shard["file"])
+            if os.path.exists(shard_path):
+                os.remove(shard_path)
+        os.remove(self.manifest_path)
+
+    def append(self, tensor_data):
+        shard_path = f"{self.base_path}.{len(self.shards):05d}.pt"
+        torch.save(tensor_data, shard_path)
+        met_values = met_column(tensor_data)
+        self.shards.append({
+            "file": os.path.basename(shard_path),
+            "rows": tensor_rows(tensor_data),
+            "met_min": float(met_values.min()) if len(met_values) else None,
+            "met_max": float(met_values.max()) if len(met_values) else None,
+        })
+        if isinstance(tensor_data, dict):
+            columns = [{"name": name, "dtype": str(column.dtype).replace("torch.", "")}
+                       for name, column in tensor_data.items()]
+        else:
+            columns = tensor_data.shape[1] if tensor_data.dim() > 1 else 1
+        self.write_manifest(columns)
+        return shard_path
+
+    def write_manifest(self, columns):
+        """columns is a list of {name, dtype} for per-column shards or a column count for 2D shards."""
+        manifest = {
+            "format": "ibex-tensor-shards",
+            "version": 2 if isinstance(columns, list) else 1,
+            "columns": columns,
+            "rows": sum(shard["rows"] for shard in self.shards),
+            "shards": self.shards,
+        }
+        temporary_path = f"{self.manifest_path}.tmp"
+        with open(temporary_path, 'w') as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(temporary_path, self.manifest_path)
+
+
+def load_manifest(manifest_path):
+    with open(manifest_path, 'r') as file:
+        return json.load(file)
+
+
+def iter_shards(manifest_path, start_time=None, end_time=None):
+    """Lazily yield shard tensors, skipping shards whose MET range misses [start_time, end_time]."""
+    manifest = load_manifest(manifest_path)
+    directory = os.path.dirname(manifest_path)
+    for shard in manifest["shards"]:
+        if shard["rows"] == 0:
+            continue
+        if start_time is not None and shard["met_max"] < start_time:
+            continue
+        if end_time is not None and shard["met_min"] > end_time:
+            continue
+        yield torch.load(os.path.join(directory, shard["file"]))
+
+
+def load_sharded_tensor(manifest_path):
+    tensors = list(iter_shards(manifest_path))
+    columns = load_manifest(manifest_path)["columns"]
+    if isinstance(columns, list):
+        if not tensors:
+            return {column["name"]: torch.empty(0, dtype=getattr(torch, column["dtype"])) for column in columns}
+        return {column["name"]: torch.cat([tensor[column["name"]] for tensor in tensors]) for column in columns}
+    if not tensors:
+        return torch.empty((0, columns))
+    return torch.cat(tensors, dim=0)
@@ -0,0 +1,56 @@
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+TESTS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIRECTORY = os.path.join(os.path.dirname(TESTS_DIRECTORY), "src")
+DATA_DIRECTORY = os.path.join(TESTS_DIRECTORY, "data")
+INSTRUCTION_FILE = os.path.join(DATA_DIRECTORY, "HiCullGoodTimes.txt")
+
+os.environ["IBEX_HEADLESS"] = "1"
+sys.path.insert(0, SOURCE_DIRECTORY)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """A private copy of the fixture archive, so tests can edit files in place."""
+    path = tmp_path / "archive"
+    shutil.copytree(os.path.join(DATA_DIRECTORY, "archive"), path)
+    return path
+
+
+@pytest.fixture
+def run_cli(tmp_path):
+    """Run `python -m ibex_cli` in a subprocess with its caches and logs kept under tmp_path."""
+    environment = dict(os.environ, PYTHONPATH=SOURCE_DIRECTORY, HOME=str(tmp_path), IBEX_HEADLESS="1")
+
+    def run(*args, timeout=120):
+        return subprocess.run([sys.executable, "-m", "ibex_cli", *map(str, args)], cwd=tmp_path, env=environment,
+                              capture_output=True, text=True, timeout=timeout)
+    return run
+
+
+@pytest.fixture
+def sort_archive(run_cli):
+    """Sort an archive's hide files with every Hi coincidence type into database, returning the finished run."""
+    def sort(archive_path, database, *extra_args):
+        result = run_cli("sort", archive_path, "--instruction", INSTRUCTION_FILE, "--qualh", "Q-ABC", "Q-AB", "None",
+                         "--file-types", "hide", "--database", database, *extra_args)
+        assert result.returncode == 0, result.stderr
+        return result
+    return sort
+
+
+def table_rows(database, table="data"):
+    with sqlite3.connect(database) as connection:
+        return sorted(connection.execute(f'SELECT MET, RA, Decl, ch, ty, count, selnbits, phase, '
+                                         f'locXRE, locYRE, locZRE FROM {table}').fetchall())
+
+
+def ledger_rows(database):
+    with sqlite3.connect(database) as connection:
+        return sorted(connection.execute('SELECT data_table, path, size, mtime_ns, rows FROM processed_files'))
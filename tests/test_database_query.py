@@ -0,0 +1,31 @@
+import numpy as np
+
+from conftest import table_rows
+from database_query import DatabaseQuery
+
+
+def test_queries_return_sorted_rows(archive, tmp_path, sort_archive):
+    database = tmp_path / "sorted.db"
+    sort_archive(archive, database)
+    query = DatabaseQuery(str(database), chunk_size=50)
+
+    everything = DatabaseQuery.collect(query.met_window(0, 2e9))
+    assert len(everything) == len(table_rows(database))
+    assert (np.diff(everything["MET"]) >= 0).all()
+
+    channel = DatabaseQuery.collect(query.channel("12", columns=["MET", "ch"]), columns=["MET", "ch"])
+    assert channel.dtype.names == ("MET", "ch")
+    assert len(channel) and (channel["ch"] == 0x12).all()
+    query.close()
+
+
+def test_query_without_matches_is_empty(archive, tmp_path, sort_archive):
+    database = tmp_path / "sorted.db"
+    sort_archive(archive, database)
+    query = DatabaseQuery(str(database))
+
+    empty = DatabaseQuery.collect(query.met_window(0, 1), columns=["MET", "ty"])
+    assert len(empty) == 0
+    assert empty.dtype == DatabaseQuery.query_dtype(["MET", "ty"])
+    assert DatabaseQuery.collect(query.coincidence_type("FF")).dtype.names == DatabaseQuery.query_dtype().names
+    query.close()
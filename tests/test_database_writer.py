@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from conftest import ledger_rows, table_rows
+from database_writer import DatabaseWriter
+from ibex_reader import IBEX_DTYPE
+
+
+def records(counts):
+    data = np.zeros(len(counts), dtype=IBEX_DTYPE)
+    data["count"] = counts
+    return data
+
+
+def test_fractional_counts_are_rejected_before_anything_is_written(tmp_path):
+    database = tmp_path / "sorted.db"
+    writer = DatabaseWriter(str(database))
+    writer.write(records([1, 2]), "/archive/good.txt", 10, 1)
+
+    with pytest.raises(ValueError, match=r"/archive/bad\.txt: count 2\.5 is not a whole number"):
+        writer.write(records([1, 2.5]), "/archive/bad.txt", 10, 1)
+    writer.close()
+
+    assert [row[5] for row in table_rows(database)] == [1, 2]
+    assert [row[1] for row in ledger_rows(database)] == ["/archive/good.txt"]
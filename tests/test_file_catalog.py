@@ -0,0 +1,50 @@
+import json
+import os
+
+from file_catalog import FileCatalog
+
+
+def test_walk_matches_os_walk(archive, tmp_path):
+    catalog = FileCatalog(str(archive), cache_path=str(tmp_path / "catalog.json")).scan()
+    expected = [(root, sorted(dirs), sorted(files)) for root, dirs, files in os.walk(archive)]
+    assert sorted((root, sorted(dirs), sorted(files)) for root, dirs, files in catalog.walk()) == sorted(expected)
+    assert catalog.rescanned_dirs == len(expected)
+
+
+def test_unchanged_directories_come_from_the_cache(archive, tmp_path):
+    cache_path = str(tmp_path / "catalog.json")
+    FileCatalog(str(archive), cache_path=cache_path).scan()
+    (archive / "2010A" / "o0020" / "extra.txt").write_text("new\n")
+
+    catalog = FileCatalog(str(archive), cache_path=cache_path).scan()
+    assert catalog.rescanned_dirs == 1
+    assert "extra.txt" in catalog.entry(str(archive / "2010A" / "o0020"))["files"]
+
+
+def test_symlink_loops_are_not_followed(archive, tmp_path):
+    os.symlink(archive, archive / "2009B" / "loop")
+    catalog = FileCatalog(str(archive), cache_path=str(tmp_path / "catalog.json")).scan()
+    assert "loop" not in catalog.subdirectories(str(archive / "2009B"))
+    assert "loop" not in catalog.entry(str(archive / "2009B"))["files"]
+    assert catalog.count_dirs() == 5
+
+
+def test_quaternion_types_and_orbits_are_cached_per_directory(archive, tmp_path):
+    cache_path = str(tmp_path / "catalog.json")
+    FileCatalog(str(archive), cache_path=cache_path).scan()
+
+    catalog = FileCatalog(str(archive), cache_path=cache_path).scan()
+    assert catalog.rescanned_dirs == 0
+    assert catalog.has_quaternion(str(archive / "2009B" / "o0011"), ".attdba")
+    assert not catalog.has_quaternion(str(archive / "2009B" / "o0011"), ".attd2a")
+    assert not catalog.has_quaternion(str(archive / "2009B"), ".attdba")
+    assert catalog.orbit(str(archive / "2010A" / "o0020")) == "0020"
+    assert catalog.orbit(str(archive / "2010A")) is None
+
+
+def test_caches_from_an_older_version_are_rescanned(archive, tmp_path):
+    cache_path = tmp_path / "catalog.json"
+    catalog = FileCatalog(str(archive), cache_path=str(cache_path)).scan()
+    cache_path.write_text(json.dumps({"root": catalog.root, "directories": catalog.directories}))
+
+    assert FileCatalog(str(archive), cache_path=str(cache_path)).scan().rescanned_dirs == 6
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from ibex_reader import IBEX_DTYPE, decode_hex, read_ibex_file
+
+
+def test_decode_hex_matches_int():
+    values = ["00", "0A", "0e", "1F", "ff", "7", "A0"]
+    assert decode_hex(values).tolist() == [int(value, 16) for value in values]
+    assert decode_hex(values).dtype == np.uint8
+    selnbits = ["00000000", "DEADBEEF", "1f", "ffffffff"]
+    assert decode_hex(selnbits, width=8, dtype=np.uint32).tolist() == [int(value, 16) for value in selnbits]
+    assert len(decode_hex([])) == 0
+
+
+@pytest.mark.parametrize("bad", ["ZZ", "0G", "1-", " 1"])
+def test_decode_hex_rejects_non_hex_digits(bad):
+    with pytest.raises(ValueError, match=repr(bad)):
+        decode_hex(["0A", bad, "05"])
+
+
+@pytest.mark.parametrize("bad", ["123", "0A0", "00000000F"])
+def test_decode_hex_rejects_overlong_values(bad):
+    width = 8 if len(bad) > 8 else 2
+    with pytest.raises(ValueError, match=repr(bad)):
+        decode_hex(["01", bad], width=width)
+
+
+def test_read_ibex_file_decodes_hex_columns(tmp_path):
+    path = tmp_path / "ibex_0011_hide-1.txt"
+    path.write_text("# header\n"
+                    "914558330.939 11.269 -63.847 12 0E 1 00 34 1.0 2.0 3.0\n"
+                    "914558377.652 121.708 33.277 1A 0c 2 1F 49 1.0 2.0 3.0\n")
+    records = read_ibex_file(str(path))
+    assert records.dtype == IBEX_DTYPE
+    assert records["ch"].tolist() == [0x12, 0x1A]
+    assert records["ty"].tolist() == [0x0E, 0x0C]
+    assert records["selnbits"].tolist() == [0, 0x1F]
+
+    path.write_text("914558330.939 11.269 -63.847 123 0E 1 00 34 1.0 2.0 3.0\n")
+    with pytest.raises(ValueError, match="'123'"):
+        read_ibex_file(str(path))
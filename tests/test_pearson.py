@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from conftest import INSTRUCTION_FILE
+from tensor_analyzer import PearsonsMatrixCreator
+
+
+def test_chunk_size_option_streams_the_same_matrix(archive, tmp_path, run_cli):
+    tensors = tmp_path / "tensors"
+    tensors.mkdir()
+    result = run_cli("tensors", archive, "--instruction", "HiCullGoodTimes.txt", "--file-type", "hide",
+                     "--timespan", "By channels", "--prefix", tensors / "hide_hex_channel")
+    assert result.returncode == 0, result.stderr
+
+    matrices = {}
+    for chunk_size in ["0", "7"]:
+        output = tmp_path / f"pearson_{chunk_size}.csv"
+        result = run_cli("pearson", tensors, tensors, "--hi-prefix", "hide_hex_channel_",
+                         "--hi-instruction", INSTRUCTION_FILE, "--lo-instruction", INSTRUCTION_FILE,
+                         "--chunk-size", chunk_size, "--output", output)
+        assert result.returncode == 0, result.stderr
+        matrices[chunk_size] = np.loadtxt(output, delimiter=',')
+
+    hi_block = matrices["0"][:6, :6]
+    assert np.isfinite(np.diag(hi_block)).all()
+    assert np.allclose(np.diag(hi_block), 1.0)
+    assert np.allclose(matrices["7"], matrices["0"], equal_nan=True)
+
+
+def test_negative_chunk_size_is_rejected(tmp_path, run_cli):
+    result = run_cli("pearson", tmp_path, tmp_path, "--chunk-size", "-5", "--output", tmp_path / "pearson.csv")
+    assert result.returncode == 2
+    assert "must be 0 or more" in result.stderr
+
+    creator = PearsonsMatrixCreator([], None, None, None, None, INSTRUCTION_FILE, INSTRUCTION_FILE)
+    with pytest.raises(ValueError, match="must be 0 or more"):
+        creator.set_chunk_size(-5)
+    creator.set_chunk_size(0)
+    assert creator.chunk_size is None
@@ -0,0 +1,114 @@
+import multiprocessing
+import os
+import queue
+
+import pytest
+
+from conftest import INSTRUCTION_FILE, ledger_rows, table_rows
+from sorting_algorithm import SortingError, database_writer_process, send_to_writer, stop_database_writer
+
+
+def test_parallel_sort_matches_serial(archive, tmp_path, sort_archive):
+    sort_archive(archive, tmp_path / "serial.db")
+    sort_archive(archive, tmp_path / "parallel.db", "--workers", "2")
+
+    serial_rows = table_rows(tmp_path / "serial.db")
+    assert serial_rows
+    assert table_rows(tmp_path / "parallel.db") == serial_rows
+    assert ledger_rows(tmp_path / "parallel.db") == ledger_rows(tmp_path / "serial.db")
+    assert len(ledger_rows(tmp_path / "serial.db")) == 18
+
+
+def test_failing_worker_stops_the_parallel_sort(archive, tmp_path, run_cli):
+    bad_file = archive / "2009B" / "o0011" / "ibex_0011_hide-1.txt"
+    with open(bad_file, 'a') as file:
+        file.write("914558400.000 1.0 2.0 11 ZZ 1 00 10 1.0 2.0 3.0\n")
+
+    result = run_cli("sort", archive, "--instruction", INSTRUCTION_FILE, "--qualh", "Q-ABC", "--file-types", "hide",
+                     "--database", tmp_path / "failed.db", "--workers", "2", timeout=60)
+
+    assert result.returncode != 0
+    assert "SortingError" in result.stderr
+    assert str(bad_file) in result.stderr
+
+
+def test_writer_that_cannot_open_its_database_reports_and_ends_its_messages(tmp_path):
+    write_queue, error_queue = queue.Queue(), queue.Queue()
+
+    with pytest.raises(Exception):
+        database_writer_process(str(tmp_path / "missing" / "data.db"), ["data"], write_queue, error_queue)
+
+    messages = [error_queue.get_nowait() for _ in range(error_queue.qsize())]
+    assert messages[0].startswith("Database writer failed:")
+    assert messages[-1] is None
+
+
+def test_dead_writer_does_not_block_the_parent():
+    context = multiprocessing.get_context("spawn")
+    writer = context.Process(target=os._exit, args=(3,))
+    writer.start()
+    writer.join()
+    write_queue, error_queue = context.Queue(maxsize=1), context.Queue()
+    write_queue.put("queued")
+
+    with pytest.raises(SortingError, match="exited with code 3"):
+        send_to_writer(writer, write_queue, "blocked")
+    assert stop_database_writer(writer, write_queue, error_queue) == []
+
+
+@pytest.mark.parametrize("workers", ["1", "2"])
+def test_rerun_skips_unchanged_files_and_reloads_edited_ones(archive, tmp_path, sort_archive, workers):
+    database = tmp_path / "resumed.db"
+    sort_archive(archive, database, "--workers", workers)
+    first_rows = table_rows(database)
+
+    rerun = sort_archive(archive, database, "--workers", workers)
+    assert "Skipped 18 files" in rerun.stderr
+    assert table_rows(database) == first_rows
+
+    # an in-place append leaves the directory mtime alone, so the catalog cache still lists the old size
+    edited_file = archive / "2009B" / "o0011" / "ibex_0011_hide-1.txt"
+    with open(edited_file, 'a') as file:
+        for i in range(50):
+            file.write(f"{914580000 + i}.500 10.0 20.0 11 0A 1 00 {i} 1.0 2.0 3.0\n")
+    rerun = sort_archive(archive, database, "--workers", workers)
+    assert "(0 directories rescanned)" in rerun.stderr
+    assert "Skipped 17 files" in rerun.stderr
+
+    fresh_database = tmp_path / "fresh.db"
+    sort_archive(archive, fresh_database, "--workers", workers)
+    assert len(table_rows(database)) == len(first_rows) + 50
+    assert table_rows(database) == table_rows(fresh_database)
+    edited_entry = [row for row in ledger_rows(database) if row[1] == str(edited_file)]
+    assert edited_entry[0][2] == os.path.getsize(edited_file)
+
+
+def sort_hide_files(run_cli, archive, database, *selection_args):
+    result = run_cli("sort", archive, "--instruction", INSTRUCTION_FILE, "--file-types", "hide",
+                     "--database", database, *selection_args)
+    assert result.returncode == 0, result.stderr
+    return result
+
+
+def test_selections_match_single_qualh_runs(archive, tmp_path, run_cli):
+    selections = {"qabc": ["Q-ABC"], "ab_none": ["Q-AB", "None"]}
+    combined = tmp_path / "combined.db"
+    sort_hide_files(run_cli, archive, combined,
+                    *[argument for name, qualh in selections.items()
+                      for argument in ("--selection", f"{name}={','.join(qualh)}")])
+
+    for name, qualh in selections.items():
+        single = tmp_path / f"{name}.db"
+        sort_hide_files(run_cli, archive, single, "--qualh", *qualh)
+        single_rows = table_rows(single)
+        assert single_rows
+        assert table_rows(combined, f"data_{name}") == single_rows
+
+
+@pytest.mark.parametrize("spec", ["Q-ABC", "=Q-ABC", "q-abc=Q-ABC", "1st=Q-ABC", "qabc="])
+def test_malformed_selections_are_rejected(archive, tmp_path, run_cli, spec):
+    result = run_cli("sort", archive, "--instruction", INSTRUCTION_FILE, "--file-types", "hide",
+                     "--database", tmp_path / "rejected.db", "--selection", spec)
+    assert result.returncode == 2
+    assert "--selection" in result.stderr
+    assert not (tmp_path / "rejected.db").exists()
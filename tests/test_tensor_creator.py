@@ -0,0 +1,169 @@
+import os
+
+import numpy as np
+import pytest
+
+import file_catalog
+import tensor_creator
+from ibex_reader import IBEX_DTYPE, TENSOR_DTYPE
+from tensor_creator import TensorCreator, compact_records, load_unit_records
+from tensor_shards import load_sharded_tensor, manifest_path_for
+
+
+def parsed_records(counts):
+    records = np.zeros(len(counts), dtype=IBEX_DTYPE)
+    records["count"] = counts
+    records["ch"] = 0x12
+    records["ty"] = 0x0A
+    return records
+
+
+def test_compact_records_keeps_counts_up_to_the_column_limit():
+    counts = [0, 1, 2 ** 31, 2 ** 32 - 1]
+    compact = compact_records(parsed_records(counts), include_hex_flags=True)
+    assert compact.dtype == TENSOR_DTYPE
+    assert compact["count"].tolist() == [0, 1, 2 ** 31, 2 ** 32 - 1]
+    assert compact["ch"].tolist() == [0x12] * 4
+
+    assert compact_records(parsed_records(counts), include_hex_flags=False)["ch"].tolist() == [0] * 4
+
+
+@pytest.mark.parametrize("bad", [1.5, float("nan")])
+def test_compact_records_rejects_fractional_counts(bad):
+    with pytest.raises(ValueError, match="whole number"):
+        compact_records(parsed_records([1, bad]), include_hex_flags=True)
+
+
+@pytest.mark.parametrize("bad", [-1, 2 ** 32, float("inf")])
+def test_compact_records_rejects_counts_outside_the_column_range(bad):
+    with pytest.raises(ValueError, match="outside the range"):
+        compact_records(parsed_records([1, bad]), include_hex_flags=True)
+
+
+def build_tensors(run_cli, archive, prefix, timespan, output_format="PyTorch tensors (.pt)", *extra_args):
+    result = run_cli("tensors", archive, "--instruction", "HiCullGoodTimes.txt", "--file-type", "hide",
+                     "--timespan", timespan, "--output-format", output_format, "--prefix", prefix, *extra_args)
+    assert result.returncode == 0, result.stderr
+    return result
+
+
+def load_output(save_path):
+    if os.path.exists(manifest_path_for(save_path)):
+        return {name: column.numpy() for name, column in load_sharded_tensor(manifest_path_for(save_path)).items()}
+    return load_unit_records(save_path if os.path.exists(save_path) else os.path.splitext(save_path)[0])
+
+
+def assert_same_records(first, second):
+    for name in TENSOR_DTYPE.names:
+        assert np.array_equal(np.asarray(first[name]), np.asarray(second[name])), name
+
+
+@pytest.mark.parametrize("output_format", ["PyTorch tensors (.pt)", "Memory-mapped columns"])
+def test_parallel_unit_builds_match_serial(archive, tmp_path, run_cli, output_format):
+    # separate prefixes per timespan, so the year builds parse raw files instead of reusing half years
+    for unit, timespan, suffixes in [("half_years", "Every half year", ["_half_year_2009B.pt", "_half_year_2010A.pt"]),
+                                     ("years", "Every year", ["_year_2009.pt", "_year_2010.pt"])]:
+        serial, parallel = str(tmp_path / f"serial_{unit}"), str(tmp_path / f"parallel_{unit}")
+        build_tensors(run_cli, archive, serial, timespan, output_format)
+        result = build_tensors(run_cli, archive, parallel, timespan, output_format, "--workers", "2")
+        assert "with 2 worker processes" in result.stderr
+        assert "Reus" not in result.stderr
+
+        for suffix in suffixes:
+            serial_records = load_output(serial + suffix)
+            assert len(serial_records["MET"])
+            assert_same_records(load_output(parallel + suffix), serial_records)
+
+
+@pytest.mark.parametrize("half_year_format", ["PyTorch tensors (.pt)", "Memory-mapped columns"])
+def test_year_and_all_data_are_derived_from_half_years(archive, tmp_path, run_cli, half_year_format):
+    parsed, derived = str(tmp_path / "parsed"), str(tmp_path / "derived")
+    build_tensors(run_cli, archive, parsed, "Every year")
+    build_tensors(run_cli, archive, parsed, "All at once")
+
+    build_tensors(run_cli, archive, derived, "Every half year", half_year_format)
+    for timespan in ["Every year", "All at once"]:
+        result = build_tensors(run_cli, archive, derived, timespan)
+        assert "Reus" in result.stderr
+        assert "Loading file" not in result.stderr
+
+    for suffix in ["_year_2009.pt", "_year_2010.pt", "_all_data.pt"]:
+        assert_same_records(load_output(derived + suffix), load_output(parsed + suffix))
+
+
+def test_only_changed_half_years_are_parsed_again(archive, tmp_path, run_cli):
+    prefix = str(tmp_path / "tensors")
+    build_tensors(run_cli, archive, prefix, "Every half year")
+    with open(archive / "2010A" / "o0020" / "ibex_0020_hide-1.txt", 'a') as file:
+        file.write("920190000.000 1.0 2.0 11 0A 5 00 10 1.0 2.0 3.0\n")
+
+    result = build_tensors(run_cli, archive, prefix, "Every year")
+    assert f"half year output {prefix}_half_year_2009B.pt" in result.stderr
+    assert f"{prefix}_half_year_2010A.pt" not in result.stderr
+    assert 920190000.0 in load_output(prefix + "_year_2010.pt")["MET"]
+
+
+def make_creator(archive, prefix, timespan):
+    creator = TensorCreator([], str(archive))
+    creator.set_instruction("HiCullGoodTimes.txt")
+    creator.set_quaternion_file(".attdba")
+    creator.set_filetype("hide")
+    creator.set_timespan_attribute(timespan)
+    creator.set_file_prefix(prefix)
+    return creator
+
+
+def test_stop_during_all_data_parse_finishes_the_current_directory(archive, tmp_path, monkeypatch):
+    monkeypatch.setattr(file_catalog, "CACHE_DIRECTORY", str(tmp_path / "cache"))
+    creator = make_creator(archive, str(tmp_path / "tensors"), "All at once")
+    loaded = []
+
+    def stop_on_first_file(label):
+        if label.startswith("Loading file"):
+            loaded.append(label)
+            creator.stop_tensor_creation_process()
+    creator.update_second_label.connect(stop_on_first_file)
+    creator.create_data_tensor()
+
+    # o0011 holds six hide files; o0012 and 2010A are never read
+    assert len(loaded) == 6
+    assert all("o0011" in label for label in loaded)
+
+
+def test_stop_during_a_reused_half_year_stops_between_chunks(archive, tmp_path, monkeypatch):
+    monkeypatch.setattr(file_catalog, "CACHE_DIRECTORY", str(tmp_path / "cache"))
+    monkeypatch.setattr(tensor_creator, "DERIVE_CHUNK_ROWS", 10)
+    prefix = str(tmp_path / "tensors")
+    make_creator(archive, prefix, "Every half year").create_data_tensor()
+    total_rows = len(load_unit_records(prefix + "_half_year_2009B.pt"))
+
+    creator = make_creator(archive, prefix, "All at once")
+    reusing = []
+    creator.update_second_label.connect(lambda label: reusing.append(label.startswith("Reusing")))
+    creator.update_second_progress.connect(
+        lambda progress: any(reusing) and creator.stop_tensor_creation_process())
+    creator.create_data_tensor()
+
+    assert creator.profiler.stages["derive"]["rows"] == 10 < total_rows
+    assert "parse" not in creator.profiler.stages
+
+
+def test_file_edited_during_a_build_is_not_reused(archive, tmp_path, monkeypatch):
+    monkeypatch.setattr(file_catalog, "CACHE_DIRECTORY", str(tmp_path / "cache"))
+    prefix = str(tmp_path / "tensors")
+    creator = make_creator(archive, prefix, "Every half year")
+    first_file = archive / "2009B" / "o0011" / "ibex_0011_hide-1.txt"
+
+    def edit_first_file_once_read(label):
+        if label.startswith("Loading file") and "o0011" in label and not label.endswith("hide-1.txt"):
+            with open(first_file, 'a') as file:
+                file.write("914558400.000 1.0 2.0 11 0A 5 00 10 1.0 2.0 3.0\n")
+            creator.update_second_label.disconnect(edit_first_file_once_read)
+    creator.update_second_label.connect(edit_first_file_once_read)
+    creator.create_data_tensor()
+
+    creator = make_creator(archive, prefix, "Every year")
+    creator.create_data_tensor()
+    reused = [line for line in creator.terminal if line.startswith("Reusing half year output")]
+    assert reused == [f"Reusing half year output {prefix}_half_year_2010A.pt"]
+    assert 914558400.0 in load_output(prefix + "_year_2009.pt")["MET"]
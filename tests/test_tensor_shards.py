@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+import torch
+
+from ibex_reader import TENSOR_DTYPE
+from tensor_analyzer import PearsonsMatrixCreator
+from tensor_shards import (ShardWriter, iter_shards, load_manifest, load_sharded_tensor, manifest_path_for,
+                           records_to_tensors, uses_shards)
+
+
+def make_records(start, rows):
+    records = np.zeros(rows, dtype=TENSOR_DTYPE)
+    records["MET"] = start + np.arange(rows, dtype=np.float64)
+    records["count"] = np.arange(rows) % 7
+    records["ch"] = 0x12
+    return records
+
+
+def analyzer():
+    return PearsonsMatrixCreator(None, None, None, None, None, None, None)
+
+
+def test_column_shards_round_trip(tmp_path):
+    save_path = str(tmp_path / "all_data.pt")
+    batches = [make_records(1000.0, 5), make_records(2000.0, 3)]
+    writer = ShardWriter(save_path)
+    for batch in batches:
+        writer.append(records_to_tensors(batch))
+
+    manifest = load_manifest(manifest_path_for(save_path))
+    assert manifest["version"] == 2
+    assert manifest["rows"] == 8
+    assert [column["name"] for column in manifest["columns"]] == list(TENSOR_DTYPE.names)
+
+    loaded = load_sharded_tensor(manifest_path_for(save_path))
+    expected = np.concatenate(batches)
+    for name in TENSOR_DTYPE.names:
+        assert loaded[name].numpy().dtype == TENSOR_DTYPE[name]
+        assert np.array_equal(loaded[name].numpy(), expected[name])
+
+    # shards outside the MET window are not loaded at all
+    assert len(list(iter_shards(manifest_path_for(save_path), start_time=1500.0))) == 1
+
+
+def test_legacy_matrix_shards_round_trip(tmp_path):
+    save_path = str(tmp_path / "legacy.pt")
+    writer = ShardWriter(save_path)
+    writer.append(torch.ones((4, 11)))
+    writer.append(torch.zeros((2, 11)))
+    loaded = load_sharded_tensor(manifest_path_for(save_path))
+    assert loaded.shape == (6, 11)
+    assert loaded[:4].eq(1).all() and loaded[4:].eq(0).all()
+
+
+def test_new_writer_replaces_previous_outputs(tmp_path):
+    save_path = str(tmp_path / "all_data.pt")
+    first = ShardWriter(save_path)
+    first.append(records_to_tensors(make_records(0.0, 3)))
+    first.append(records_to_tensors(make_records(10.0, 3)))
+    torch.save(records_to_tensors(make_records(99.0, 1)), save_path)
+
+    ShardWriter(save_path).append(records_to_tensors(make_records(50.0, 2)))
+
+    assert not os.path.exists(save_path)
+    assert not os.path.exists(str(tmp_path / "all_data.00001.pt"))
+    assert load_sharded_tensor(manifest_path_for(save_path))["MET"].tolist() == [50.0, 51.0]
+
+
+def test_newer_of_single_file_and_shards_is_loaded(tmp_path):
+    save_path = str(tmp_path / "channel_1.pt")
+    manifest_path = manifest_path_for(save_path)
+    ShardWriter(save_path).append(records_to_tensors(make_records(100.0, 2)))
+    torch.save(records_to_tensors(make_records(0.0, 4)), save_path)
+
+    # a single file left behind by an earlier run must not hide the shards written after it
+    os.utime(save_path, (1, 1))
+    assert uses_shards(save_path)
+    assert analyzer().load_tensor(save_path)["MET"].tolist() == [100.0, 101.0]
+    met_chunks = [met for met, _ in analyzer().iter_met_and_counts(save_path, 10)]
+    assert np.concatenate(met_chunks).tolist() == [100.0, 101.0]
+
+    os.utime(manifest_path, (0, 0))
+    assert not uses_shards(save_path)
+    assert len(analyzer().load_tensor(save_path)["MET"]) == 4